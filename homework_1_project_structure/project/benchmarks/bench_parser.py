@@ -0,0 +1,101 @@
+import argparse
+import os
+import re
+import time
+from typing import Callable, List, Optional, Tuple
+
+import structlog
+from src.app.log_file_helpers import iter_log_data
+from src.app.logger import configure_logging, logger
+from src.app.regex_helpers import generate_bytes_search_pattern, generate_search_pattern
+
+LOG_LINE = (
+    "1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] "
+    '"GET /api/v2/banner/{url_id} HTTP/1.1" 200 927 "-" '
+    '"Lynx/2.8.8dev.9 libwww-FM/2.14 SSL-MM/1.4.1 GNUTLS/2.10.5" "-" '
+    '"1498697422-2190034393-4708-9752759" "dc7161be3" 0.{request_time:03d}\n'
+)
+
+
+def generate_lines(lines_count: int) -> List[bytes]:
+    return [
+        LOG_LINE.format(url_id=index % 1000, request_time=index % 997).encode()
+        for index in range(lines_count)
+    ]
+
+
+def extract_log_data_baseline(
+    log_line: str, regex_pattern: re.Pattern[str]
+) -> Optional[Tuple[str, str]]:
+    # The parser before the bytes rework: re.search through the module cache
+    # and a debug event for every line.
+    match = re.search(regex_pattern, log_line)
+    if match:
+        logger.debug(
+            "Extracted log data",
+            log_line=log_line,
+            url=match.group(2),
+            request_time=match.group(3),
+        )
+        return match.group(2), match.group(3)
+    return None
+
+
+def parse_baseline(str_lines: List[str], str_pattern: re.Pattern[str]) -> int:
+    # The development profile renders every debug event; write them to
+    # /dev/null so the terminal does not dominate the measurement.
+    with open(os.devnull, "w") as devnull:
+        configure_logging()
+        structlog.configure(logger_factory=structlog.PrintLoggerFactory(devnull))
+        try:
+            return sum(
+                1 for line in str_lines if extract_log_data_baseline(line, str_pattern)
+            )
+        finally:
+            structlog.reset_defaults()
+
+
+def measure(name: str, parse: Callable[[], int], lines_count: int) -> None:
+    started = time.perf_counter()
+    parsed = parse()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<12} {parsed:>10} lines {lines_count / elapsed:>14,.0f} lines/sec")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="Log parser benchmark")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument(
+        "--baseline-lines",
+        type=int,
+        default=100_000,
+        help="lines for the slow baseline parser, 0 to skip it",
+    )
+    args = parser.parse_args()
+
+    byte_lines = generate_lines(args.lines)
+    str_lines = [line.decode("utf-8") for line in byte_lines]
+    str_pattern = generate_search_pattern()
+    bytes_pattern = generate_bytes_search_pattern()
+
+    if args.baseline_lines:
+        baseline_lines = str_lines[: args.baseline_lines]
+        measure(
+            "baseline",
+            lambda: parse_baseline(baseline_lines, str_pattern),
+            len(baseline_lines),
+        )
+    measure(
+        "str regex",
+        lambda: sum(1 for data in iter_log_data(str_lines, str_pattern) if data),
+        args.lines,
+    )
+    measure(
+        "bytes regex",
+        lambda: sum(1 for data in iter_log_data(byte_lines, bytes_pattern) if data),
+        args.lines,
+    )
+
+
+if __name__ == "__main__":
+    main()
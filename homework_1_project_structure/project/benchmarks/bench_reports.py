@@ -0,0 +1,151 @@
+import argparse
+import os
+import resource
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, Tuple, TypeVar
+
+from benchmarks.generate_log import generate_log_file, parse_size
+from src.app.analysis_helpers import collect_log_file_request_data
+from src.app.gzip_helpers import iter_gzip_log_lines
+from src.app.log_file_helpers import iter_log_data
+from src.app.math_helpers import create_times_factory
+from src.app.parallel_helpers import read_log_file_shard
+from src.app.regex_helpers import generate_bytes_search_pattern
+from src.app.report_helpers import (
+    build_reports,
+    collect_request_data,
+    write_report_file,
+)
+
+T = TypeVar("T")
+
+TEMPLATE_FILE = os.path.join(os.path.dirname(__file__), "..", "report.html")
+
+
+def timed(run: Callable[[], T]) -> Tuple[T, float]:
+    started = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - started
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def iter_log_lines(log_file_name: str, workers: int) -> Iterator[bytes]:
+    """Lines as the analyzer reads them: mmap or the threaded gzip inflater."""
+    if log_file_name.endswith("gz"):
+        return iter_gzip_log_lines(log_file_name, workers)
+    return read_log_file_shard(log_file_name)
+
+
+def count_lines(log_file_name: str, workers: int) -> int:
+    return sum(1 for _ in iter_log_lines(log_file_name, workers))
+
+
+def count_parsed_lines(log_file_name: str, workers: int) -> int:
+    log_lines = iter_log_lines(log_file_name, workers)
+    log_data = iter_log_data(log_lines, generate_bytes_search_pattern())
+    return sum(1 for data in log_data if data)
+
+
+def benchmark_stages(
+    log_file_name: str, time_stats_mode: str, report_size: int, workers: int = 1
+) -> Dict[str, float]:
+    """Time each stage of the analyzer on its own.
+
+    Stages are not separable inside one pass, so every pass adds one stage to
+    the previous one and the stage time is the difference. The read, regex
+    and aggregate passes run in one process; the end-to-end pass goes through
+    collect_log_file_request_data with ``workers`` shard processes or gzip
+    inflater threads.
+    """
+    new_times = create_times_factory(time_stats_mode)
+    search_pattern = generate_bytes_search_pattern()
+
+    lines_count, read_elapsed = timed(lambda: count_lines(log_file_name, workers))
+    _, parse_elapsed = timed(lambda: count_parsed_lines(log_file_name, workers))
+
+    def aggregate():
+        log_data = iter_log_data(iter_log_lines(log_file_name, workers), search_pattern)
+        return collect_request_data(log_data, new_times)
+
+    requests_data, aggregate_elapsed = timed(aggregate)
+    reports, stats_elapsed = timed(
+        lambda: build_reports(requests_data, report_size=report_size)
+    )
+    with tempfile.TemporaryDirectory() as report_dir:
+        report_path = os.path.join(report_dir, "report.html")
+        _, render_elapsed = timed(
+            lambda: write_report_file(reports, TEMPLATE_FILE, report_path)
+        )
+
+    config = {"TIME_STATS_MODE": time_stats_mode}
+
+    def analyze():
+        requests_data = collect_log_file_request_data(log_file_name, config, workers)
+        return build_reports(requests_data, report_size=report_size)
+
+    _, total_elapsed = timed(analyze)
+    return {
+        "lines": lines_count,
+        "urls": len(requests_data),
+        "read": read_elapsed,
+        "regex": max(0.0, parse_elapsed - read_elapsed),
+        "aggregate": max(0.0, aggregate_elapsed - parse_elapsed),
+        "stats": stats_elapsed,
+        "render": render_elapsed,
+        "analyze": total_elapsed,
+    }
+
+
+def print_results(results: Dict[str, float]) -> None:
+    lines_count = results["lines"]
+    print(f"{'lines':<18} {lines_count:>12,}")
+    print(f"{'urls':<18} {results['urls']:>12,}")
+    for stage in ("read", "regex", "aggregate", "stats", "render", "analyze"):
+        print(f"{stage:<18} {results[stage]:>11.3f}s")
+    lines_per_sec = lines_count / results["analyze"]
+    print(f"{'throughput':<18} {lines_per_sec:>12,.0f} lines/sec")
+    print(f"{'peak RSS':<18} {peak_rss_mb():>11.1f}M")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="Log analyzer benchmark")
+    parser.add_argument(
+        "--log", help="existing log to analyze instead of a synthetic one"
+    )
+    parser.add_argument("--size", type=parse_size, default="50MB")
+    parser.add_argument("--urls", type=int, default=10_000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument(
+        "--time-stats-mode", choices=["exact", "approximate"], default="exact"
+    )
+    parser.add_argument("--report-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.log:
+        print_results(
+            benchmark_stages(
+                args.log, args.time_stats_mode, args.report_size, args.workers
+            )
+        )
+        return
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        suffix = ".gz" if args.gzip else ""
+        log_file_name = os.path.join(log_dir, f"nginx-access-ui.log-20170630{suffix}")
+        generate_log_file(log_file_name, args.size, args.urls, args.zipf)
+        print_results(
+            benchmark_stages(
+                log_file_name, args.time_stats_mode, args.report_size, args.workers
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import gzip
+import io
+import itertools
+import random
+import re
+from typing import Iterator, List
+
+LOG_LINE = (
+    '1.196.116.{client} -  - [29/Jun/2017:03:50:22 +0300] "{method} {url} HTTP/1.1" '
+    '200 {size} "-" "Lynx/2.8.8dev.9 libwww-FM/2.14 SSL-MM/1.4.1 GNUTLS/2.10.5" "-" '
+    '"1498697422-2190034393-4708-9752759" "dc7161be3" {request_time:.3f}\n'
+)
+URL_TEMPLATES = (
+    "/api/v2/banner/{id}",
+    "/api/v2/group/{id}/statistic/sites/?date_type=day&date_from=2017-06-28",
+    "/api/1/photogenic_banners/list/?server_name=WIN7RB{id}",
+    "/export/appinstall_raw/2017-06-{id}/",
+)
+BATCH_SIZE = 10_000
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(size: str) -> int:
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMG]?)B?", size.strip().upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size: {size}")
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def zipf_cum_weights(urls_count: int, exponent: float) -> List[float]:
+    return list(
+        itertools.accumulate(1 / rank**exponent for rank in range(1, urls_count + 1))
+    )
+
+
+def generate_urls(urls_count: int) -> List[str]:
+    return [
+        URL_TEMPLATES[rank % len(URL_TEMPLATES)].format(id=rank)
+        for rank in range(urls_count)
+    ]
+
+
+def generate_log_lines(
+    urls_count: int = 10_000, exponent: float = 1.1, seed: int = 0
+) -> Iterator[bytes]:
+    """Endless, reproducible stream of nginx log lines.
+
+    URL popularity follows a Zipf law, and the slow URLs are the rare ones,
+    as in real logs.
+    """
+    rng = random.Random(seed)
+    urls = generate_urls(urls_count)
+    ranks = range(urls_count)
+    cum_weights = zipf_cum_weights(urls_count, exponent)
+    while True:
+        lines = []
+        for rank in rng.choices(ranks, cum_weights=cum_weights, k=BATCH_SIZE):
+            lines.append(
+                LOG_LINE.format(
+                    client=rank % 256,
+                    method="POST" if rank % 7 == 0 else "GET",
+                    url=urls[rank],
+                    size=rng.randrange(100, 100_000),
+                    request_time=rng.expovariate(10) * (1 + rank / urls_count),
+                )
+            )
+        yield "".join(lines).encode()
+
+
+def write_log(
+    log_file: io.BufferedIOBase,
+    size: int,
+    urls_count: int = 10_000,
+    exponent: float = 1.1,
+    seed: int = 0,
+) -> int:
+    written = 0
+    for chunk in generate_log_lines(urls_count, exponent, seed):
+        if written + len(chunk) > size:
+            chunk = chunk[: chunk.rfind(b"\n", 0, size - written) + 1]
+        log_file.write(chunk)
+        written += len(chunk)
+        if written >= size or not chunk:
+            return written
+    return written
+
+
+def generate_log_file(
+    log_file_name: str,
+    size: int,
+    urls_count: int = 10_000,
+    exponent: float = 1.1,
+    seed: int = 0,
+) -> int:
+    """Write about ``size`` uncompressed bytes of log, gzipped for ``.gz`` names."""
+    if log_file_name.endswith(".gz"):
+        with gzip.open(log_file_name, "wb", compresslevel=1) as log_file:
+            return write_log(log_file, size, urls_count, exponent, seed)
+    with open(log_file_name, "wb") as log_file:
+        return write_log(log_file, size, urls_count, exponent, seed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="Synthetic nginx log generator")
+    parser.add_argument("output", help="log file to write, gzipped if it ends in .gz")
+    parser.add_argument("--size", type=parse_size, default="100MB")
+    parser.add_argument("--urls", type=int, default=10_000, help="URL cardinality")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    written = generate_log_file(args.output, args.size, args.urls, args.zipf, args.seed)
+    print(f"wrote {written:,} bytes of log to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
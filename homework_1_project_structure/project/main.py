@@ -1,24 +1,63 @@
 import argparse
-import gzip
 import json
+from functools import partial
+from typing import Any, Dict
 
+from src.app.analysis_helpers import (
+    backfill_reports,
+    collect_log_file_request_data,
+    collect_log_file_request_data_incremental,
+    export_aggregate,
+    generate_config_reports,
+    generate_report_from_aggregate,
+)
+from src.app.exceptions import ParseErrorBudgetExceeded
 from src.app.log_file_helpers import find_log_file_name_and_date
 from src.app.logger import configure_logging, logger
-from src.app.regex_helpers import generate_search_pattern
-from src.app.report_helpers import generate_report_file, generate_reports
+from src.app.profiling_helpers import enable_timing_spans, run_profiled
+from src.app.report_helpers import (
+    generate_report_file,
+    generate_report_path,
+    is_report_up_to_date,
+)
 
-config = {
+config: Dict[str, Any] = {
     "REPORT_SIZE": 1000,
     "REPORT_DIR": "./reports",
     "LOG_DIR": "./log",
     "TEMPLATE_FILE": "report.html",
     "LOG_FILE": None,
+    "DEBUG_SAMPLE_RATE": 0.0,
+    "TIME_STATS_MODE": "exact",
+    "SKETCH_ERROR": 0.01,
+    "TIME_PERCENTILES": [],
+    "INCREMENTAL": False,
+    "CHECKPOINT_FILE": None,
+    "LOG_INDEX_FILE": None,
+    "AGGREGATE_DIR": None,
+    "URL_STRIP_QUERY": False,
+    "URL_COLLAPSE_IDS": False,
+    "MAX_URLS": None,
+    "MAX_PARSE_ERROR_RATIO": 0.2,
+    "TIMING_SPANS": False,
+    "LOG_PROFILE": "development",
+    "LOG_LEVEL": "INFO",
 }
 
 
 def main():
     parser = argparse.ArgumentParser(prog="Log Analyzer")
     parser.add_argument("--config", type=str)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--backfill", action="store_true")
+    parser.add_argument("--since", type=str, help="first log date, YYYYMMDD")
+    parser.add_argument("--until", type=str, help="last log date, YYYYMMDD")
+    parser.add_argument("--merge", choices=["week", "month"])
+    parser.add_argument("--from-aggregate", type=str, help="render from an aggregate")
+    parser.add_argument("--profile", type=str, help="write cProfile stats to a file")
+    parser.add_argument(
+        "--tracemalloc", type=str, help="write a tracemalloc snapshot to a file"
+    )
     config_file_path = parser.parse_args()
 
     if config_file_path.config:
@@ -26,7 +65,11 @@ def main():
             with open(config_file_path.config, "r") as conf:
                 external_conf_data = json.loads(conf.read())
                 config.update(external_conf_data)
-                configure_logging(config.get("LOG_FILE"))
+                configure_logging(
+                    config.get("LOG_FILE"),
+                    config.get("LOG_PROFILE", "development"),
+                    config.get("LOG_LEVEL", "INFO"),
+                )
 
         except FileNotFoundError as err:
             logger.error(err)
@@ -35,31 +78,71 @@ def main():
                 config_file_path=config_file_path.config,
             )
 
-    log_file_name, latest_date = find_log_file_name_and_date(config)
+    enable_timing_spans(bool(config.get("TIMING_SPANS")))
+    if config_file_path.profile or config_file_path.tracemalloc:
+        run_profiled(
+            partial(run, config_file_path),
+            config_file_path.profile,
+            config_file_path.tracemalloc,
+        )
+        return
+    run(config_file_path)
+
+
+def run(config_file_path: argparse.Namespace) -> None:
+    if config_file_path.from_aggregate:
+        report_path = generate_report_from_aggregate(
+            config_file_path.from_aggregate, config
+        )
+        logger.info("Report generated from aggregate", report_path=report_path)
+        return
+
+    if config_file_path.backfill:
+        backfill_reports(
+            config,
+            config_file_path.workers,
+            config_file_path.since,
+            config_file_path.until,
+            config_file_path.merge,
+        )
+        logger.info("Backfill completed")
+        return
 
-    search_pattern = generate_search_pattern()
+    latest_log_file = find_log_file_name_and_date(config)
+    if latest_log_file is None:
+        logger.info("Nothing to analyze")
+        return
+    log_file_name, latest_date = latest_log_file
+
+    report_path = generate_report_path(config, latest_date)
+    if is_report_up_to_date(report_path, log_file_name):
+        logger.info("Report is up to date", report_path=report_path)
+        return
 
     logger.info("Starting log analysis", config=config)
 
     try:
-        if log_file_name.endswith("gz"):
-            with gzip.open(log_file_name, "rt", encoding="utf-8") as log_file:
-                reports = generate_reports(
-                    log_file=log_file, search_pattern=search_pattern
-                )
-                generate_report_file(reports, config, latest_date)
+        if config.get("INCREMENTAL"):
+            requests_data = collect_log_file_request_data_incremental(
+                log_file_name, config, config_file_path.workers
+            )
         else:
-            with open(log_file_name, "r") as log_file:
-                reports = generate_reports(
-                    log_file=log_file, search_pattern=search_pattern
-                )
-                generate_report_file(reports, config, latest_date)
+            requests_data = collect_log_file_request_data(
+                log_file_name, config, config_file_path.workers
+            )
+        export_aggregate(requests_data, config, latest_date)
+        reports = generate_config_reports(requests_data, config)
+        generate_report_file(reports, config, latest_date)
     except FileNotFoundError as err:
         logger.error(err)
         logger.error(
             "Log file not found",
             config_file_path=config_file_path.config,
         )
+    except ParseErrorBudgetExceeded as err:
+        logger.error(err)
+        logger.error("Report not generated", log_file_name=log_file_name)
+        return
 
     logger.info("Log analysis completed")
 
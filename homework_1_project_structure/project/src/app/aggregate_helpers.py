@@ -0,0 +1,188 @@
+import heapq
+import json
+import math
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.app.file_helpers import atomic_write
+from src.app.math_helpers import RequestAccumulator, Times, settle_time_sums
+from src.app.report_helpers import RequestsData, build_reports
+from src.app.sketch_helpers import KLLSketch
+
+AGGREGATE_MAGIC = b"LOGAGG1\n"
+AGGREGATE_VERSION = 1
+HEADER_LENGTH = struct.Struct("<I")
+
+
+def generate_aggregate_path(config: dict, file_date: str) -> str:
+    return os.path.join(config["AGGREGATE_DIR"], f"aggregate-{file_date}.agg")
+
+
+def build_aggregate_columns(requests_data: RequestsData) -> Dict[str, array]:
+    columns: Dict[str, array] = {
+        "url_offsets": array("q", [0]),
+        "urls": array("B"),
+        "count": array("q"),
+        "time_sum": array("d"),
+        "time_max": array("d"),
+        "count_error": array("q"),
+        "value_offsets": array("q", [0]),
+        "values": array("d"),
+        "value_levels": array("B"),
+    }
+    settle_time_sums(requests_data)
+    for url, request in requests_data.items():
+        columns["urls"].frombytes(url.encode("utf-8"))
+        columns["url_offsets"].append(len(columns["urls"]))
+        columns["count"].append(request.count)
+        columns["time_sum"].append(request.time_sum)
+        columns["time_max"].append(request.time_max)
+        columns["count_error"].append(request.count_error)
+        if isinstance(request.times, KLLSketch):
+            for level, compactor in enumerate(request.times.compactors):
+                columns["values"].extend(compactor)
+                columns["value_levels"].extend([level] * len(compactor))
+        else:
+            columns["values"].extend(request.times)
+        columns["value_offsets"].append(len(columns["values"]))
+    return columns
+
+
+def write_aggregate_file(
+    aggregate_path: str, requests_data: RequestsData, file_date: str
+) -> None:
+    """Store per-URL aggregates as one contiguous buffer per column."""
+    sketch_k = next(
+        (
+            request.times.k
+            for request in requests_data.values()
+            if isinstance(request.times, KLLSketch)
+        ),
+        None,
+    )
+    columns = build_aggregate_columns(requests_data)
+    header = json.dumps(
+        {
+            "version": AGGREGATE_VERSION,
+            "date": file_date,
+            "byteorder": sys.byteorder,
+            "sketch_k": sketch_k,
+            "urls": len(requests_data),
+            "columns": [
+                {"name": name, "typecode": column.typecode, "length": len(column)}
+                for name, column in columns.items()
+            ],
+        }
+    ).encode("utf-8")
+
+    with atomic_write(aggregate_path, "wb") as aggregate_file:
+        aggregate_file.write(AGGREGATE_MAGIC)
+        aggregate_file.write(HEADER_LENGTH.pack(len(header)))
+        aggregate_file.write(header)
+        for column in columns.values():
+            column.tofile(aggregate_file)
+
+
+def read_aggregate_file(aggregate_path: str) -> Tuple[dict, Dict[str, array]]:
+    with open(aggregate_path, "rb") as aggregate_file:
+        if aggregate_file.read(len(AGGREGATE_MAGIC)) != AGGREGATE_MAGIC:
+            raise ValueError(f"{aggregate_path} is not a log aggregate file")
+        (header_length,) = HEADER_LENGTH.unpack(aggregate_file.read(HEADER_LENGTH.size))
+        header = json.loads(aggregate_file.read(header_length))
+        if header["version"] != AGGREGATE_VERSION:
+            raise ValueError(f"Unsupported aggregate version {header['version']}")
+
+        columns = {}
+        for column_info in header["columns"]:
+            column = array(column_info["typecode"])
+            column.fromfile(aggregate_file, column_info["length"])
+            if header["byteorder"] != sys.byteorder:
+                column.byteswap()
+            columns[column_info["name"]] = column
+    return header, columns
+
+
+def build_sketch(k: int, values: array, levels: array, count: int) -> KLLSketch:
+    sketch = KLLSketch(k)
+    while len(sketch.compactors) <= max(levels, default=0):
+        sketch.grow()
+    for value, level in zip(values, levels):
+        sketch.compactors[level].append(value)
+    sketch.retained = len(values)
+    sketch.count = count
+    return sketch
+
+
+def build_request(
+    header: dict, columns: Dict[str, array], index: int
+) -> RequestAccumulator:
+    value_offsets = columns["value_offsets"]
+    value_start, value_end = value_offsets[index], value_offsets[index + 1]
+    values = columns["values"][value_start:value_end]
+    times: Times = values
+    if header["sketch_k"] is not None:
+        times = build_sketch(
+            header["sketch_k"],
+            values,
+            columns["value_levels"][value_start:value_end],
+            columns["count"][index],
+        )
+    return RequestAccumulator(
+        times=times,
+        count=columns["count"][index],
+        time_sum=columns["time_sum"][index],
+        time_max=columns["time_max"][index],
+        # Files written before Space-Saving ranks were stored have no column.
+        count_error=columns["count_error"][index] if "count_error" in columns else 0,
+    )
+
+
+def get_url(columns: Dict[str, array], index: int) -> str:
+    url_offsets = columns["url_offsets"]
+    url_start, url_end = url_offsets[index], url_offsets[index + 1]
+    return columns["urls"][url_start:url_end].tobytes().decode("utf-8")
+
+
+def build_requests_data(
+    header: dict, columns: Dict[str, array], indexes: Iterable[int]
+) -> RequestsData:
+    return {
+        get_url(columns, index): build_request(header, columns, index)
+        for index in indexes
+    }
+
+
+def load_aggregate_requests_data(aggregate_path: str) -> Tuple[str, RequestsData]:
+    header, columns = read_aggregate_file(aggregate_path)
+    return header["date"], build_requests_data(header, columns, range(header["urls"]))
+
+
+def generate_reports_from_aggregate(
+    aggregate_path: str,
+    percentiles: Iterable[int] = (),
+    report_size: Optional[int] = None,
+) -> Tuple[str, List[dict]]:
+    """Render report rows from an aggregate file without reparsing the log.
+
+    Totals come straight from the columns and only the selected URLs are
+    materialized.
+    """
+    header, columns = read_aggregate_file(aggregate_path)
+    indexes: Iterable[int] = range(header["urls"])
+    if report_size is not None and report_size < header["urls"]:
+        time_sums = columns["time_sum"]
+        indexes = heapq.nsmallest(
+            report_size,
+            indexes,
+            key=lambda index: (-time_sums[index], get_url(columns, index)),
+        )
+    reports = build_reports(
+        build_requests_data(header, columns, indexes),
+        percentiles,
+        total_count=sum(columns["count"]),
+        total_time=math.fsum(columns["time_sum"]),
+    )
+    return header["date"], reports
@@ -0,0 +1,249 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from src.app.aggregate_helpers import (
+    generate_aggregate_path,
+    generate_reports_from_aggregate,
+    write_aggregate_file,
+)
+from src.app.checkpoint_helpers import (
+    Checkpoint,
+    find_complete_lines_end,
+    get_checkpoint_path,
+    get_checkpoint_settings,
+    load_checkpoint,
+    save_checkpoint,
+)
+from src.app.exceptions import ParseErrorBudgetExceeded
+from src.app.gzip_helpers import iter_gzip_log_lines
+from src.app.log_file_helpers import (
+    ParseStats,
+    find_log_files,
+    iter_log_data,
+)
+from src.app.logger import logger
+from src.app.math_helpers import create_times_factory
+from src.app.parallel_helpers import (
+    collect_request_data_parallel,
+    read_log_file_shard,
+)
+from src.app.profiling_helpers import timing_span
+from src.app.regex_helpers import generate_bytes_search_pattern
+from src.app.report_helpers import (
+    RequestsData,
+    build_reports,
+    cap_request_data,
+    collect_request_data,
+    generate_period_key,
+    generate_period_report_path,
+    generate_report_file,
+    generate_report_path,
+    is_report_up_to_date,
+    merge_request_data,
+    write_report_file,
+)
+from src.app.url_helpers import create_url_normalizer
+
+
+def collect_log_file_request_data(
+    log_file_name: str,
+    config: dict,
+    workers: int = 1,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> RequestsData:
+    """Aggregate a log, aborting if too many of its lines cannot be parsed."""
+    parse_stats = ParseStats()
+    with timing_span("collect_request_data") as span:
+        requests_data = read_log_file_request_data(
+            log_file_name, config, parse_stats, workers, start, end
+        )
+        span.items = parse_stats.total_lines
+    logger.info(
+        "Parsed log lines",
+        total_lines=parse_stats.total_lines,
+        error_lines=parse_stats.error_lines,
+    )
+    parse_stats.check_error_budget(config.get("MAX_PARSE_ERROR_RATIO"))
+    return requests_data
+
+
+def read_log_file_request_data(
+    log_file_name: str,
+    config: dict,
+    parse_stats: ParseStats,
+    workers: int = 1,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> RequestsData:
+    search_pattern = generate_bytes_search_pattern()
+    debug_sample_rate = config.get("DEBUG_SAMPLE_RATE", 0.0)
+    new_times = create_times_factory(
+        config.get("TIME_STATS_MODE", "exact"), config.get("SKETCH_ERROR", 0.01)
+    )
+    normalize_url = create_url_normalizer(config)
+    max_urls = config.get("MAX_URLS")
+
+    if log_file_name.endswith("gz"):
+        log_data = iter_log_data(
+            iter_gzip_log_lines(log_file_name, workers),
+            search_pattern,
+            debug_sample_rate,
+            parse_stats,
+        )
+        return collect_request_data(log_data, new_times, normalize_url, max_urls)
+
+    if workers > 1:
+        return collect_request_data_parallel(
+            log_file_name,
+            search_pattern,
+            workers,
+            debug_sample_rate,
+            new_times,
+            start,
+            end,
+            normalize_url,
+            max_urls,
+            parse_stats,
+        )
+
+    log_data = iter_log_data(
+        read_log_file_shard(log_file_name, start, end),
+        search_pattern,
+        debug_sample_rate,
+        parse_stats,
+    )
+    return collect_request_data(log_data, new_times, normalize_url, max_urls)
+
+
+def collect_log_file_request_data_incremental(
+    log_file_name: str, config: dict, workers: int = 1
+) -> RequestsData:
+    """Parse only what was appended to the log since the last checkpoint.
+
+    Compressed logs are final once rotated and are always parsed in full.
+    """
+    if log_file_name.endswith("gz"):
+        return collect_log_file_request_data(log_file_name, config, workers)
+
+    checkpoint_path = get_checkpoint_path(config)
+    settings = get_checkpoint_settings(config)
+    stat = os.stat(log_file_name)
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint and checkpoint.can_resume(log_file_name, stat, settings):
+        start, previous_requests_data = checkpoint.offset, checkpoint.requests_data
+        logger.info("Resuming log analysis from checkpoint", offset=start)
+    else:
+        start, previous_requests_data = 0, {}
+
+    end = find_complete_lines_end(log_file_name, start, stat.st_size)
+    new_requests_data = collect_log_file_request_data(
+        log_file_name, config, workers, start, end
+    )
+    requests_data = merge_request_data([previous_requests_data, new_requests_data])
+    if config.get("MAX_URLS"):
+        cap_request_data(requests_data, config["MAX_URLS"])
+
+    save_checkpoint(
+        checkpoint_path,
+        Checkpoint(
+            log_file_name=os.path.abspath(log_file_name),
+            inode=stat.st_ino,
+            offset=end,
+            settings=settings,
+            requests_data=requests_data,
+        ),
+    )
+    logger.info("Saved checkpoint", path=checkpoint_path, offset=end)
+    return requests_data
+
+
+def generate_config_reports(requests_data: RequestsData, config: dict) -> list:
+    return build_reports(
+        requests_data,
+        percentiles=config.get("TIME_PERCENTILES", []),
+        report_size=config.get("REPORT_SIZE"),
+    )
+
+
+def export_aggregate(requests_data: RequestsData, config: dict, file_date: str) -> None:
+    if not config.get("AGGREGATE_DIR"):
+        return
+    aggregate_path = generate_aggregate_path(config, file_date)
+    write_aggregate_file(aggregate_path, requests_data, file_date)
+    logger.info("Aggregate exported", aggregate_path=aggregate_path)
+
+
+def generate_report_from_aggregate(aggregate_path: str, config: dict) -> str:
+    file_date, reports = generate_reports_from_aggregate(
+        aggregate_path,
+        percentiles=config.get("TIME_PERCENTILES", []),
+        report_size=config.get("REPORT_SIZE"),
+    )
+    generate_report_file(reports, config, file_date)
+    return generate_report_path(config, file_date)
+
+
+def analyze_backfill_log_file(
+    log_file: Tuple[str, str], config: dict, keep_requests_data: bool
+) -> Tuple[str, Optional[RequestsData]]:
+    log_file_name, log_file_date = log_file
+    report_path = generate_report_path(config, log_file_date)
+    if not keep_requests_data and is_report_up_to_date(report_path, log_file_name):
+        logger.info("Report is up to date", report_path=report_path)
+        return log_file_date, None
+
+    try:
+        requests_data = collect_log_file_request_data(log_file_name, config)
+    except ParseErrorBudgetExceeded as err:
+        logger.error("Skipping log", log_file_name=log_file_name, error=str(err))
+        return log_file_date, None
+    export_aggregate(requests_data, config, log_file_date)
+    generate_report_file(
+        generate_config_reports(requests_data, config), config, log_file_date
+    )
+    logger.info("Report generated", report_path=report_path)
+    return log_file_date, requests_data if keep_requests_data else None
+
+
+def backfill_reports(
+    config: dict,
+    workers: int = 1,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    merge_period: Optional[str] = None,
+) -> None:
+    """Write one report per log in LOG_DIR, plus optional weekly/monthly ones.
+
+    Logs are analyzed concurrently, one per process. Period reports merge
+    the per-day aggregates instead of parsing the logs again.
+    """
+    log_files = find_log_files(config, since, until)
+    logger.info("Starting backfill", log_files=len(log_files), workers=workers)
+
+    analyze = partial(
+        analyze_backfill_log_file,
+        config=config,
+        keep_requests_data=merge_period is not None,
+    )
+    period_requests_data: Dict[str, List[RequestsData]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for log_file_date, requests_data in executor.map(analyze, log_files):
+            if merge_period and requests_data is not None:
+                period_key = generate_period_key(log_file_date, merge_period)
+                period_requests_data.setdefault(period_key, []).append(requests_data)
+
+    for period_key, daily_requests_data in period_requests_data.items():
+        report_path = generate_period_report_path(config, period_key)
+        requests_data = merge_request_data(daily_requests_data)
+        if config.get("MAX_URLS"):
+            cap_request_data(requests_data, config["MAX_URLS"])
+        write_report_file(
+            generate_config_reports(requests_data, config),
+            config["TEMPLATE_FILE"],
+            report_path,
+        )
+        logger.info("Period report generated", report_path=report_path)
@@ -0,0 +1,89 @@
+import dataclasses
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+from src.app.file_helpers import atomic_write
+from src.app.logger import logger
+from src.app.report_helpers import RequestsData
+
+CHECKPOINT_FILE_NAME = ".log-analyzer-checkpoint.pickle"
+CHECKPOINT_SETTINGS = (
+    "TIME_STATS_MODE",
+    "SKETCH_ERROR",
+    "URL_STRIP_QUERY",
+    "URL_COLLAPSE_IDS",
+    "MAX_URLS",
+)
+
+
+@dataclasses.dataclass
+class Checkpoint:
+    log_file_name: str
+    inode: int
+    offset: int
+    settings: Dict[str, Any]
+    requests_data: RequestsData
+
+    def can_resume(
+        self, log_file_name: str, stat: os.stat_result, settings: Dict[str, Any]
+    ) -> bool:
+        return (
+            self.log_file_name == os.path.abspath(log_file_name)
+            and self.inode == stat.st_ino
+            and self.offset <= stat.st_size
+            and self.settings == settings
+        )
+
+
+def get_checkpoint_settings(config: dict) -> Dict[str, Any]:
+    """Config keys that change how requests are aggregated.
+
+    Data saved under other values is keyed or counted differently and cannot
+    be merged with a new run.
+    """
+    return {key: config.get(key) for key in CHECKPOINT_SETTINGS}
+
+
+def get_checkpoint_path(config: dict) -> str:
+    return config.get("CHECKPOINT_FILE") or os.path.join(
+        config.get("REPORT_DIR", "."), CHECKPOINT_FILE_NAME
+    )
+
+
+def load_checkpoint(checkpoint_path: str) -> Optional[Checkpoint]:
+    try:
+        with open(checkpoint_path, "rb") as checkpoint_file:
+            checkpoint = pickle.load(checkpoint_file)
+    except FileNotFoundError:
+        return None
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as err:
+        logger.warning("Ignoring unreadable checkpoint", path=checkpoint_path, error=err)
+        return None
+    if not isinstance(checkpoint, Checkpoint) or not hasattr(checkpoint, "settings"):
+        logger.warning("Ignoring unknown checkpoint format", path=checkpoint_path)
+        return None
+    return checkpoint
+
+
+def save_checkpoint(checkpoint_path: str, checkpoint: Checkpoint) -> None:
+    with atomic_write(checkpoint_path, "wb") as checkpoint_file:
+        pickle.dump(checkpoint, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def find_complete_lines_end(log_file_name: str, start: int, end: int) -> int:
+    """Return the offset just past the last newline in [start, end).
+
+    A line that is still being appended is left for the next run.
+    """
+    chunk_size = 1 << 16
+    with open(log_file_name, "rb") as log_file:
+        position = end
+        while position > start:
+            chunk_start = max(start, position - chunk_size)
+            log_file.seek(chunk_start)
+            newline = log_file.read(position - chunk_start).rfind(b"\n")
+            if newline != -1:
+                return chunk_start + newline + 1
+            position = chunk_start
+    return start
@@ -0,0 +1,18 @@
+class LogAnalyzerError(Exception):
+    pass
+
+
+class ParseErrorBudgetExceeded(LogAnalyzerError):
+    def __init__(self, error_lines: int, total_lines: int, max_error_ratio: float):
+        self.error_lines = error_lines
+        self.total_lines = total_lines
+        self.max_error_ratio = max_error_ratio
+        # Unpickling calls __init__(*args), so args must be the constructor
+        # arguments for the error to cross a process pool.
+        super().__init__(error_lines, total_lines, max_error_ratio)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.error_lines} of {self.total_lines} log lines could not be parsed, "
+            f"more than the allowed ratio of {self.max_error_ratio}"
+        )
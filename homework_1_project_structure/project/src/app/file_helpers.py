@@ -0,0 +1,39 @@
+import contextlib
+import os
+import tempfile
+from typing import IO, Iterator, Optional
+
+# NamedTemporaryFile creates files readable by the owner only; give the final
+# file the permissions a plain open() would have.
+UMASK = os.umask(0)
+os.umask(UMASK)
+FILE_MODE = 0o666 & ~UMASK
+
+
+@contextlib.contextmanager
+def atomic_write(
+    path: str, mode: str = "w", encoding: Optional[str] = None
+) -> Iterator[IO]:
+    """Write into a uniquely named temporary file that replaces ``path`` on success.
+
+    Concurrent writers never share the temporary file, and on any error it is
+    removed while ``path`` keeps its previous content.
+    """
+    directory, file_name = os.path.split(path)
+    file = tempfile.NamedTemporaryFile(
+        mode,
+        encoding=encoding,
+        dir=directory or ".",
+        prefix=f".{file_name}.",
+        suffix=".tmp",
+        delete=False,
+    )
+    try:
+        with file:
+            os.fchmod(file.fileno(), FILE_MODE)
+            yield file
+        os.replace(file.name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(file.name)
+        raise
@@ -0,0 +1,188 @@
+import queue
+import struct
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    BinaryIO,
+    Deque,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from src.app.logger import logger
+from src.app.profiling_helpers import timing_span
+
+GZIP_MAGIC = b"\x1f\x8b\x08"
+GZIP_FEXTRA = 0x04
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+READ_CHUNK_SIZE = 1 << 20
+QUEUE_SIZE = 16
+
+
+def find_gzip_members(log_file: BinaryIO) -> Optional[List[Tuple[int, int]]]:
+    """Return (offset, size) of every member of a blocked gzip file.
+
+    Member boundaries can only be found without inflating when each header
+    carries its own size, as the "BC" extra subfield written by bgzip does.
+    For any other gzip file None is returned.
+    """
+    members: List[Tuple[int, int]] = []
+    offset = 0
+    while True:
+        log_file.seek(offset)
+        header = log_file.read(12)
+        if not header:
+            return members
+        if len(header) < 12 or header[:3] != GZIP_MAGIC:
+            return None
+        if not header[3] & GZIP_FEXTRA:
+            return None
+        (extra_length,) = struct.unpack("<H", header[10:12])
+        extra = log_file.read(extra_length)
+        member_size = None
+        position = 0
+        while position + 4 <= len(extra):
+            subfield_id, subfield_length = struct.unpack_from("<2sH", extra, position)
+            if subfield_id == b"BC" and subfield_length == 2:
+                (block_size,) = struct.unpack_from("<H", extra, position + 4)
+                member_size = block_size + 1
+            position += 4 + subfield_length
+        if member_size is None:
+            return None
+        members.append((offset, member_size))
+        offset += member_size
+
+
+def inflate_stream(log_file: BinaryIO) -> Iterator[bytes]:
+    """Inflate every member of a gzip file in turn.
+
+    Like ``gzip.open``, raises EOFError when the last member is cut short.
+    """
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    member_started = False
+    while True:
+        compressed = log_file.read(READ_CHUNK_SIZE)
+        if not compressed:
+            break
+        while compressed:
+            member_started = True
+            chunk = decompressor.decompress(compressed)
+            if chunk:
+                yield chunk
+            if not decompressor.eof:
+                break
+            compressed = decompressor.unused_data
+            decompressor = zlib.decompressobj(GZIP_WBITS)
+            member_started = False
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+    if member_started and not decompressor.eof:
+        raise EOFError(
+            "Compressed file ended before the end-of-stream marker was reached"
+        )
+
+
+def inflate_members(
+    log_file: BinaryIO, members: List[Tuple[int, int]], workers: int
+) -> Iterator[bytes]:
+    def read_member(member: Tuple[int, int]) -> bytes:
+        offset, size = member
+        log_file.seek(offset)
+        return log_file.read(size)
+
+    # zlib releases the GIL while inflating, so member threads run in parallel.
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: Deque = deque()
+        for member in members:
+            pending.append(
+                executor.submit(zlib.decompress, read_member(member), GZIP_WBITS)
+            )
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_gzip_chunks(
+    log_file_name: str, workers: int = 1
+) -> Generator[bytes, None, None]:
+    """Inflate a gzip file in a background thread, feeding a bounded queue.
+
+    Decompression overlaps with whatever consumes the chunks. Blocked gzip
+    files (bgzip) are additionally inflated member by member on ``workers``
+    threads.
+    """
+    chunks: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    done = object()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def inflate() -> None:
+        try:
+            with (
+                timing_span("gzip_inflate", items=0) as span,
+                open(log_file_name, "rb") as log_file,
+            ):
+                members = find_gzip_members(log_file) if workers > 1 else None
+                log_file.seek(0)
+                if members:
+                    logger.info(
+                        "Inflating gzip members concurrently",
+                        members=len(members),
+                        workers=workers,
+                    )
+                    stream = inflate_members(log_file, members, workers)
+                else:
+                    stream = inflate_stream(log_file)
+                inflated_bytes = 0
+                for chunk in stream:
+                    inflated_bytes += len(chunk)
+                    span.items = inflated_bytes
+                    if not put(chunk):
+                        return
+            put(done)
+        except BaseException as err:
+            put(err)
+
+    reader = threading.Thread(target=inflate, name="gzip-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        reader.join()
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    tail = b""
+    for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
+
+
+def iter_gzip_log_lines(log_file_name: str, workers: int = 1) -> Iterator[bytes]:
+    return iter_lines(iter_gzip_chunks(log_file_name, workers))
@@ -1,29 +1,191 @@
+import dataclasses
+import json
+import mmap
 import os
+import random
 import re
-from typing import Dict, List, Optional, Tuple
+from itertools import count
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
+from src.app.exceptions import ParseErrorBudgetExceeded
+from src.app.file_helpers import atomic_write
 from src.app.logger import logger
 from src.app.regex_helpers import generate_log_file_name_search_pattern
 
+PARSE_ERROR_SAMPLE_SIZE = 10
+PARSE_ERROR_SAMPLE_LENGTH = 500
+
+
+@dataclasses.dataclass
+class ParseStats:
+    """Line counters plus a uniform reservoir sample of unparsed lines.
+
+    Only lines that fail to parse touch the reservoir, so well-formed logs
+    pay for nothing but the line counter.
+    """
+
+    total_lines: int = 0
+    error_lines: int = 0
+    samples: List[str] = dataclasses.field(default_factory=list)
+    sample_size: int = PARSE_ERROR_SAMPLE_SIZE
+    rng: random.Random = dataclasses.field(
+        default_factory=lambda: random.Random(0), repr=False, compare=False
+    )
+
+    @property
+    def error_ratio(self) -> float:
+        return self.error_lines / self.total_lines if self.total_lines else 0.0
+
+    def record_error(self, log_line: Union[str, bytes]) -> None:
+        self.error_lines += 1
+        if len(self.samples) < self.sample_size:
+            self.samples.append(format_sample_line(log_line))
+            return
+        index = self.rng.randrange(self.error_lines)
+        if index < self.sample_size:
+            self.samples[index] = format_sample_line(log_line)
+
+    def merge(self, other: "ParseStats") -> None:
+        mine, theirs = list(self.samples), list(other.samples)
+        mine_weight, theirs_weight = self.error_lines, other.error_lines
+        samples: List[str] = []
+        while len(samples) < self.sample_size and (mine or theirs):
+            total_weight = mine_weight + theirs_weight
+            if theirs and (not mine or self.rng.random() * total_weight < theirs_weight):
+                samples.append(theirs.pop(self.rng.randrange(len(theirs))))
+                theirs_weight -= 1
+            else:
+                samples.append(mine.pop(self.rng.randrange(len(mine))))
+                mine_weight -= 1
+        self.samples = samples
+        self.total_lines += other.total_lines
+        self.error_lines += other.error_lines
+
+    def check_error_budget(self, max_error_ratio: Optional[float]) -> None:
+        if max_error_ratio is None or self.error_ratio <= max_error_ratio:
+            return
+        logger.error(
+            "Too many unparsed log lines",
+            error_lines=self.error_lines,
+            total_lines=self.total_lines,
+            samples=self.samples,
+        )
+        raise ParseErrorBudgetExceeded(
+            self.error_lines, self.total_lines, max_error_ratio
+        )
+
+
+def format_sample_line(log_line: Union[str, bytes]) -> str:
+    if isinstance(log_line, bytes):
+        log_line = log_line.decode("utf-8", "replace")
+    return log_line.rstrip("\n")[:PARSE_ERROR_SAMPLE_LENGTH]
+
 
 def extract_log_data(
     log_line: str, regex_pattern: re.Pattern[str]
 ) -> Optional[Tuple[str, str]]:
-    match = re.search(regex_pattern, log_line)
+    match = regex_pattern.search(log_line)
     if match:
-        logger.debug(
-            "Extracted log data",
-            log_line=log_line,
-            url=match.group(2),
-            request_time=match.group(3),
-        )
         return match.group(2), match.group(3)
     return None
 
 
+def extract_log_data_bytes(
+    log_line: bytes, regex_pattern: re.Pattern[bytes]
+) -> Optional[Tuple[str, bytes]]:
+    match = regex_pattern.search(log_line)
+    if match:
+        url, request_time = match.groups()
+        return url.decode("utf-8", "replace"), request_time
+    return None
+
+
+def iter_log_data(
+    log_lines: Iterable,
+    regex_pattern: re.Pattern,
+    debug_sample_rate: float = 0.0,
+    parse_stats: Optional[ParseStats] = None,
+) -> Iterator[Optional[Tuple[str, Union[str, bytes]]]]:
+    extract = (
+        extract_log_data_bytes
+        if isinstance(regex_pattern.pattern, bytes)
+        else extract_log_data
+    )
+    if debug_sample_rate:
+        return iter_sampled_log_data(
+            log_lines, regex_pattern, extract, debug_sample_rate, parse_stats
+        )
+    if parse_stats is not None:
+        return iter_counted_log_data(log_lines, regex_pattern, extract, parse_stats)
+    return (extract(line, regex_pattern) for line in log_lines)
+
+
+def iter_counted_log_data(
+    log_lines: Iterable,
+    regex_pattern: re.Pattern,
+    extract,
+    parse_stats: ParseStats,
+) -> Iterator[Optional[Tuple[str, Union[str, bytes]]]]:
+    lines_count = 0
+    try:
+        for lines_count, line in enumerate(log_lines, 1):
+            data = extract(line, regex_pattern)
+            if data is None:
+                parse_stats.record_error(line)
+            yield data
+    finally:
+        parse_stats.total_lines += lines_count
+
+
+def iter_sampled_log_data(
+    log_lines: Iterable,
+    regex_pattern: re.Pattern,
+    extract,
+    debug_sample_rate: float,
+    parse_stats: Optional[ParseStats] = None,
+) -> Iterator[Optional[Tuple[str, Union[str, bytes]]]]:
+    sample_step = max(1, round(1 / debug_sample_rate))
+    for line_number, line in zip(count(), log_lines):
+        data = extract(line, regex_pattern)
+        if line_number % sample_step == 0:
+            logger.debug("Extracted log data", log_line=line, log_data=data)
+        if parse_stats is not None:
+            parse_stats.total_lines += 1
+            if data is None:
+                parse_stats.record_error(line)
+        yield data
+
+
+def iter_mmap_log_lines(
+    log_file_name: str, start: int = 0, end: Optional[int] = None
+) -> Iterator[bytes]:
+    """Yield the lines starting in [start, end) of a memory-mapped plain log.
+
+    Lines are cut by mmap.readline straight from the page cache, without the
+    read buffer of a file object, so shard workers share one cached copy of
+    the log.
+    """
+    with open(log_file_name, "rb") as log_file:
+        size = os.fstat(log_file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return
+        with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            mapped.seek(start)
+            readline = mapped.readline
+            position = start
+            while position < end:
+                line = readline()
+                if not line:
+                    break
+                position += len(line)
+                yield line
+
+
 def collect_log_file_names(log_folder: str) -> List[str]:
     logger.info("Collecting log file names")
-    return [file_name for file_name in os.listdir(log_folder)]
+    with os.scandir(log_folder) as entries:
+        return [entry.name for entry in entries if entry.is_file()]
 
 
 def validate_log_file_names(
@@ -38,6 +200,66 @@ def get_latest_log_file(log_folder: str, latest_date: str) -> str:
     return f"{log_folder}/nginx-access-ui.log-{latest_date}"
 
 
+def load_log_index(
+    log_index_path: str, log_folder: str, log_folder_mtime: int
+) -> Optional[Tuple[str, str]]:
+    try:
+        with open(log_index_path, "r", encoding="utf-8") as index_file:
+            log_index = json.load(index_file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if (
+        log_index.get("log_dir") != os.path.abspath(log_folder)
+        or log_index.get("mtime_ns") != log_folder_mtime
+    ):
+        return None
+    logger.info("Using cached log directory index", log_index_path=log_index_path)
+    return log_index["log_file_name"], log_index["date"]
+
+
+def save_log_index(
+    log_index_path: str,
+    log_folder: str,
+    log_folder_mtime: int,
+    log_file_name: str,
+    log_file_date: str,
+) -> None:
+    with atomic_write(log_index_path, "w", encoding="utf-8") as index_file:
+        json.dump(
+            {
+                "log_dir": os.path.abspath(log_folder),
+                "mtime_ns": log_folder_mtime,
+                "log_file_name": log_file_name,
+                "date": log_file_date,
+            },
+            index_file,
+        )
+
+
+def find_log_files(
+    config: Dict[str, str], since: Optional[str] = None, until: Optional[str] = None
+) -> List[Tuple[str, str]]:
+    """Return (log file name, date) of every log in LOG_DIR, oldest first."""
+    file_name_search_pattern = generate_log_file_name_search_pattern()
+    log_folder = config.get("LOG_DIR")
+    if not log_folder:
+        logger.warning("LOG_DIR not found in config")
+        return []
+
+    log_files: Dict[str, str] = {}
+    for file_name in sorted(
+        validate_log_file_names(
+            collect_log_file_names(log_folder), file_name_search_pattern
+        )
+    ):
+        log_file_suffix = file_name.split("-")[-1]
+        log_file_date = log_file_suffix[:8]
+        if (since and log_file_date < since) or (until and log_file_date > until):
+            continue
+        log_files.setdefault(log_file_date, f"{log_folder}/{file_name}")
+    return [(log_files[date], date) for date in sorted(log_files)]
+
+
 def find_log_file_name_and_date(config: Dict[str, str]) -> Optional[Tuple[str, str]]:
     file_name_search_pattern = generate_log_file_name_search_pattern()
     log_folder = config.get("LOG_DIR")
@@ -45,16 +267,35 @@ def find_log_file_name_and_date(config: Dict[str, str]) -> Optional[Tuple[str, s
         logger.warning("LOG_DIR not found in config")
         return None
 
+    # A directory's mtime changes whenever an entry is added, removed or renamed,
+    # so an unchanged mtime means the cached latest log is still the latest one.
+    log_index_path = config.get("LOG_INDEX_FILE")
+    log_folder_mtime = os.stat(log_folder).st_mtime_ns if log_index_path else 0
+    if log_index_path:
+        cached = load_log_index(log_index_path, log_folder, log_folder_mtime)
+        if cached:
+            return cached
+
     log_file_names = collect_log_file_names(log_folder)
     validated_log_files = validate_log_file_names(
         log_file_names, file_name_search_pattern
     )
-    log_file_dates = [file_date.split("-")[-1] for file_date in validated_log_files]
+    log_file_suffixes = [file_name.split("-")[-1] for file_name in validated_log_files]
 
-    if not log_file_dates:
+    if not log_file_suffixes:
         logger.warning("No log files found in the log directory")
         return None
 
-    latest_log_file_date = max(log_file_dates)
-    log_file_name = get_latest_log_file(log_folder, latest_log_file_date)
+    latest_log_file_suffix = max(log_file_suffixes)
+    latest_log_file_date = latest_log_file_suffix[:8]
+    log_file_name = get_latest_log_file(log_folder, latest_log_file_suffix)
+
+    if log_index_path:
+        save_log_index(
+            log_index_path,
+            log_folder,
+            log_folder_mtime,
+            log_file_name,
+            latest_log_file_date,
+        )
     return log_file_name, latest_log_file_date
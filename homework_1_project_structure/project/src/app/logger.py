@@ -1,10 +1,24 @@
+import atexit
 import logging
-from typing import Optional
+import logging.handlers
+import os
+import queue
+from typing import List, Optional
 
 import structlog
 
+queue_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(
+    log_file_path: Optional[str] = None,
+    profile: str = "development",
+    level: str = "INFO",
+) -> None:
+    if profile == "production":
+        configure_production_logging(log_file_path, level)
+        return
 
-def configure_logging(log_file_path: Optional[str] = None) -> None:
     processors = [
         structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M.%S"),
         structlog.processors.add_log_level,
@@ -30,4 +44,65 @@ def configure_logging(log_file_path: Optional[str] = None) -> None:
         )
 
 
+def configure_production_logging(
+    log_file_path: Optional[str] = None, level: str = "INFO"
+) -> None:
+    """JSON lines, filtered by level before any processor runs.
+
+    Calls below ``level`` are no-ops of the bound logger, and records are
+    handed to a queue so file writes happen on the listener thread instead of
+    in the parse loop.
+    """
+    global queue_listener
+    log_level = logging.getLevelName(level.upper())
+
+    structlog.configure(
+        processors=[
+            structlog.processors.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso", utc=True),
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(),
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(log_level),
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+
+    handler: logging.Handler = (
+        logging.FileHandler(log_file_path) if log_file_path else logging.StreamHandler()
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    stop_queue_listener()
+    records: queue.Queue = queue.Queue(-1)
+    queue_listener = logging.handlers.QueueListener(records, handler)
+    queue_listener.start()
+    set_root_handlers([logging.handlers.QueueHandler(records)], log_level)
+
+
+def set_root_handlers(handlers: List[logging.Handler], level: int) -> None:
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    for handler in handlers:
+        root_logger.addHandler(handler)
+    root_logger.setLevel(level)
+
+
+def stop_queue_listener() -> None:
+    global queue_listener
+    if queue_listener is not None:
+        queue_listener.stop()
+        queue_listener = None
+
+
+def write_directly_after_fork() -> None:
+    # The listener thread does not survive fork, so forked workers write to the
+    # listener's handlers themselves instead of filling an undrained queue.
+    if queue_listener is not None:
+        set_root_handlers(list(queue_listener.handlers), logging.getLogger().level)
+
+
+atexit.register(stop_queue_listener)
+os.register_at_fork(after_in_child=write_directly_after_fork)
+
 logger = structlog.get_logger()
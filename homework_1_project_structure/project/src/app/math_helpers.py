@@ -1,27 +1,133 @@
+import dataclasses
+import math
+from array import array
+from functools import partial
 from statistics import median
+from types import ModuleType
+from typing import Callable, Dict, Iterable, Optional, Union
+
+from src.app.sketch_helpers import KLLSketch, sketch_k_for_error
+
+numpy: Optional[ModuleType]
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+Times = Union[array, KLLSketch]
+
+
+def new_timings_buffer() -> array:
+    return array("d")
+
+
+def as_vector(times: Times):
+    """Zero-copy NumPy view of an array('d') buffer, if NumPy is installed."""
+    if numpy is not None and isinstance(times, array) and len(times):
+        return numpy.frombuffer(times, dtype=numpy.float64)
+    return None
 
 
 def count_percentile(number_of_requests: float, total_count: float) -> float:
     return (number_of_requests / total_count) * 100
 
 
-def count_total(requests_data: dict, key: str) -> float:
-    count_array = []
+@dataclasses.dataclass(slots=True)
+class RequestAccumulator:
+    times: Times
+    count: int = 0
+    time_sum: float = 0.0
+    time_max: float = -math.inf
+    # Space-Saving overestimate used by cap_request_data: hits this key may
+    # have had before it entered a capped table. Reported numbers never
+    # include it.
+    count_error: int = 0
+
+    def add(self, request_time: float) -> None:
+        self.count += 1
+        self.time_sum += request_time
+        if request_time > self.time_max:
+            self.time_max = request_time
+        self.times.append(request_time)
+
+    def merge(self, other: "RequestAccumulator") -> None:
+        self.count += other.count
+        self.time_sum += other.time_sum
+        self.time_max = max(self.time_max, other.time_max)
+        if isinstance(self.times, KLLSketch):
+            self.times.extend(other.times)
+        elif isinstance(other.times, KLLSketch):
+            raise TypeError("Cannot merge a sketch into exact timings")
+        else:
+            self.times.extend(other.times)
+        self.count_error += other.count_error
+
+    @property
+    def eviction_priority(self) -> int:
+        return self.count + self.count_error
+
+    def settle_time_sum(self) -> None:
+        """Replace the running sum with fsum over the exact timings.
+
+        A running float sum depends on the order values were added and shards
+        merged; fsum is correctly rounded, so any split of the log gives the
+        same value. Sketches keep no exact timings and keep the running sum.
+        """
+        if not isinstance(self.times, KLLSketch):
+            self.time_sum = math.fsum(self.times)
+
+
+def median_times(times: Times) -> float:
+    if isinstance(times, KLLSketch):
+        return times.median()
+    vector = as_vector(times)
+    if numpy is not None and vector is not None:
+        return float(numpy.median(vector))
+    return median(times)
+
+
+def quantile_times(times: Times, fraction: float) -> float:
+    if isinstance(times, KLLSketch):
+        return times.quantile(fraction)
+    index = max(1, math.ceil(fraction * len(times))) - 1
+    vector = as_vector(times)
+    if numpy is not None and vector is not None:
+        return float(numpy.partition(vector, index)[index])
+    return sorted(times)[index]
+
+
+def create_times_factory(
+    time_stats_mode: str = "exact", sketch_error: float = 0.01
+) -> Callable[[], Times]:
+    if time_stats_mode == "approximate":
+        return partial(KLLSketch, sketch_k_for_error(sketch_error))
+    if time_stats_mode == "exact":
+        return new_timings_buffer
+    raise ValueError(f"Unknown time stats mode: {time_stats_mode}")
+
+
+def settle_time_sums(requests_data: Dict[str, RequestAccumulator]) -> None:
     for request in requests_data.values():
-        if isinstance(request[key], list):
-            count_array.append(sum(request[key]))
-            continue
-        count_array.append(request[key])
-    return sum(count_array)
+        request.settle_time_sum()
+
+
+def count_total(requests_data: Dict[str, RequestAccumulator], key: str) -> float:
+    return math.fsum(getattr(request, key) for request in requests_data.values())
 
 
-def count_time_statistics(request_time_array: dict) -> dict:
+def count_time_statistics(
+    requests_data: Dict[str, RequestAccumulator], percentiles: Iterable[int] = ()
+) -> dict:
     time_stats = {}
-    for url, data in request_time_array.items():
+    for url, request in requests_data.items():
         time_stats[url] = {
-            "sum": sum(data["times"]),
-            "avg": sum(data["times"]) / len(data["times"]),
-            "max": max(data["times"]),
-            "med": median(data["times"]),
+            "sum": request.time_sum,
+            "avg": request.time_sum / request.count,
+            "max": request.time_max,
+            "med": median_times(request.times),
         }
+        for percentile in percentiles:
+            time_stats[url][f"p{percentile}"] = quantile_times(
+                request.times, percentile / 100
+            )
     return time_stats
@@ -0,0 +1,100 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from src.app.log_file_helpers import ParseStats, iter_log_data, iter_mmap_log_lines
+from src.app.logger import logger
+from src.app.math_helpers import Times, new_timings_buffer
+from src.app.report_helpers import (
+    RequestsData,
+    cap_request_data,
+    collect_request_data,
+    merge_request_data,
+)
+from src.app.url_helpers import UrlNormalizer
+
+
+def split_log_file(
+    log_file_name: str, shards_count: int, start: int = 0, end: Optional[int] = None
+) -> List[Tuple[int, int]]:
+    if end is None:
+        end = os.path.getsize(log_file_name)
+    boundaries = [start]
+    with open(log_file_name, "rb") as log_file:
+        for shard in range(1, shards_count):
+            target = start + (end - start) * shard // shards_count
+            if target > 0:
+                log_file.seek(max(target, boundaries[-1]) - 1)
+                log_file.readline()
+            boundaries.append(min(log_file.tell(), end))
+    boundaries.append(end)
+    return [
+        (start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end
+    ]
+
+
+def read_log_file_shard(
+    log_file_name: str, start: int = 0, end: Optional[int] = None
+) -> Iterator[bytes]:
+    return iter_mmap_log_lines(log_file_name, start, end)
+
+
+def collect_shard_request_data(
+    shard: Tuple[int, int],
+    log_file_name: str,
+    search_pattern: re.Pattern,
+    debug_sample_rate: float,
+    new_times: Callable[[], Times],
+    normalize_url: Optional[UrlNormalizer] = None,
+    max_urls: Optional[int] = None,
+) -> Tuple[RequestsData, ParseStats]:
+    start, end = shard
+    parse_stats = ParseStats()
+    log_data = iter_log_data(
+        read_log_file_shard(log_file_name, start, end),
+        search_pattern,
+        debug_sample_rate,
+        parse_stats,
+    )
+    requests_data = collect_request_data(log_data, new_times, normalize_url, max_urls)
+    return requests_data, parse_stats
+
+
+def collect_request_data_parallel(
+    log_file_name: str,
+    search_pattern: re.Pattern,
+    workers: int,
+    debug_sample_rate: float = 0.0,
+    new_times: Callable[[], Times] = new_timings_buffer,
+    start: int = 0,
+    end: Optional[int] = None,
+    normalize_url: Optional[UrlNormalizer] = None,
+    max_urls: Optional[int] = None,
+    parse_stats: Optional[ParseStats] = None,
+) -> RequestsData:
+    shards = split_log_file(log_file_name, workers, start, end)
+    logger.info("Starting parallel log analysis", workers=workers, shards=len(shards))
+
+    collect_shard = partial(
+        collect_shard_request_data,
+        log_file_name=log_file_name,
+        search_pattern=search_pattern,
+        debug_sample_rate=debug_sample_rate,
+        new_times=new_times,
+        normalize_url=normalize_url,
+        max_urls=max_urls,
+    )
+    partial_requests_data = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shard_requests_data, shard_parse_stats in executor.map(
+            collect_shard, shards
+        ):
+            partial_requests_data.append(shard_requests_data)
+            if parse_stats is not None:
+                parse_stats.merge(shard_parse_stats)
+    requests_data = merge_request_data(partial_requests_data)
+    if max_urls:
+        cap_request_data(requests_data, max_urls)
+    return requests_data
@@ -0,0 +1,84 @@
+import contextlib
+import cProfile
+import dataclasses
+import time
+import tracemalloc
+from typing import Callable, Iterator, Optional, TypeVar
+
+from src.app.logger import logger
+
+T = TypeVar("T")
+
+TRACEMALLOC_TOP_STATS = 10
+timing_spans_enabled = False
+
+
+def enable_timing_spans(enabled: bool = True) -> None:
+    global timing_spans_enabled
+    timing_spans_enabled = enabled
+
+
+@dataclasses.dataclass
+class TimingSpan:
+    stage: str
+    items: Optional[int] = None
+    started: float = dataclasses.field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+
+@contextlib.contextmanager
+def timing_span(stage: str, items: Optional[int] = None) -> Iterator[TimingSpan]:
+    """Time a pipeline stage and log it when timing spans are enabled.
+
+    The item count can be filled in on the yielded span once it is known.
+    """
+    span = TimingSpan(stage, items)
+    yield span
+    span.elapsed = time.perf_counter() - span.started
+    if not timing_spans_enabled:
+        return
+    if span.items is None:
+        logger.info("Stage finished", stage=stage, elapsed=round(span.elapsed, 6))
+        return
+    logger.info(
+        "Stage finished",
+        stage=stage,
+        elapsed=round(span.elapsed, 6),
+        items=span.items,
+        items_per_sec=round(span.items / span.elapsed) if span.elapsed else None,
+    )
+
+
+def run_profiled(
+    run: Callable[[], T],
+    profile_path: Optional[str] = None,
+    tracemalloc_path: Optional[str] = None,
+) -> T:
+    """Run under cProfile and/or tracemalloc, dumping the results to files.
+
+    The cProfile dump can be read with ``python -m pstats`` or snakeviz, the
+    tracemalloc snapshot with ``tracemalloc.Snapshot.load``.
+    """
+    profiler = cProfile.Profile() if profile_path else None
+    if tracemalloc_path:
+        tracemalloc.start()
+    try:
+        if profiler is None:
+            return run()
+        return profiler.runcall(run)
+    finally:
+        if profiler is not None and profile_path:
+            profiler.dump_stats(profile_path)
+            logger.info("Profile saved", profile_path=profile_path)
+        if tracemalloc_path:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot.dump(tracemalloc_path)
+            top_statistics = snapshot.statistics("lineno")[:TRACEMALLOC_TOP_STATS]
+            logger.info(
+                "Memory snapshot saved",
+                tracemalloc_path=tracemalloc_path,
+                peak_bytes=peak,
+                top=[str(statistic) for statistic in top_statistics],
+            )
@@ -8,6 +8,14 @@ def generate_search_pattern() -> re.Pattern[str]:
     return re.compile(r"\"([A-Z]+) (/[^\s]+) HTTP/1\.[01]\"\s.*\s(\d+\.\d+)$")
 
 
+def generate_bytes_search_pattern() -> re.Pattern[bytes]:
+    logger.info("Generating bytes search pattern")
+    # The greedy ".*" runs to the end of the line and backs off only over the
+    # trailing request_time, so matching stays linear in the line length; it
+    # measured faster than cutting request_time off with rsplit in Python.
+    return re.compile(rb"\"[A-Z]+ (/\S+) HTTP/1\.[01]\" .* (\d+\.\d+)$")
+
+
 def generate_log_file_name_search_pattern() -> re.Pattern[str]:
     logger.info("Generating log file name search pattern")
-    return re.compile(r"nginx-access-ui\.log-\d{8}(\.gz)?")
+    return re.compile(r"nginx-access-ui\.log-(\d{8})(\.gz)?$")
@@ -1,51 +1,142 @@
+import heapq
 import json
+import os
 import re
 from datetime import datetime, timedelta
-from typing import Dict, List, TextIO, Union
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
 
-from src.app.log_file_helpers import extract_log_data
-from src.app.math_helpers import count_percentile, count_time_statistics, count_total
+from src.app.file_helpers import atomic_write
+from src.app.log_file_helpers import iter_log_data
+from src.app.math_helpers import (
+    RequestAccumulator,
+    Times,
+    count_percentile,
+    count_time_statistics,
+    count_total,
+    new_timings_buffer,
+    settle_time_sums,
+)
+from src.app.profiling_helpers import timing_span
+from src.app.url_helpers import UrlNormalizer, normalize_log_data
+
+RequestsData = Dict[str, RequestAccumulator]
+
+OTHER_URL = "other"
+TABLE_PLACEHOLDER = "$table_json"
+REPORT_WRITE_CHUNK_SIZE = 1000
 
 
 def generate_percentiles_report(
-    requests_data: dict, key_to_count: str, total_count: float
+    requests_data: RequestsData, key_to_count: str, total_count: float
 ) -> Dict[str, float]:
     percentiles = {}
-    for url, data in requests_data.items():
-        if isinstance(data[key_to_count], list):
-            percentile = count_percentile(sum(data[key_to_count]), total_count)
-            percentiles[url] = percentile
-            continue
-        percentile = count_percentile(data[key_to_count], total_count)
-        percentiles[url] = percentile
+    for url, request in requests_data.items():
+        percentiles[url] = count_percentile(getattr(request, key_to_count), total_count)
     return percentiles
 
 
 def collect_request_data(
-    log_data: list,
-) -> Dict[str, Dict[str, Union[int, List[float]]]]:
-    request_data: dict = {}
+    log_data: Iterable[Optional[Tuple[str, Union[str, bytes]]]],
+    new_times: Callable[[], Times] = new_timings_buffer,
+    normalize_url: Optional[UrlNormalizer] = None,
+    max_urls: Optional[int] = None,
+) -> RequestsData:
+    if normalize_url is not None:
+        log_data = normalize_log_data(log_data, normalize_url)
+    request_data: RequestsData = {}
+    evicted_floor = 0
     for data in log_data:
         if data:
             url, request_time = data
-            if url in request_data:
-                request_data[url]["count"] += 1
-                request_data[url]["times"].append(float(request_time))
+            request = request_data.get(url)
+            if request is None:
+                if max_urls and len(request_data) >= 2 * max_urls:
+                    cap_request_data(request_data, max_urls)
+                    evicted_floor = get_evicted_floor(request_data)
+                request = request_data[url] = RequestAccumulator(
+                    new_times(), count_error=evicted_floor
+                )
+            request.add(float(request_time))
+    if max_urls:
+        cap_request_data(request_data, max_urls)
+    return request_data
+
+
+def get_evicted_floor(requests_data: RequestsData) -> int:
+    other = requests_data.get(OTHER_URL)
+    return other.count_error if other is not None else 0
+
+
+def cap_request_data(requests_data: RequestsData, max_urls: int) -> RequestsData:
+    """Fold the least requested URLs into OTHER_URL, keeping ``max_urls`` keys.
+
+    This is a batched Space-Saving: collect_request_data lets the table grow
+    to twice the cap and then evicts the tail in one go. Keys are ranked by
+    count plus count_error, and OTHER_URL's count_error keeps the highest
+    rank evicted so far. A key seen after that may already have had that
+    many hits, so it starts from there, and a heavy hitter that appears late
+    still outranks the rows that were counted from the start. The
+    accumulators themselves stay exact, so totals are unaffected.
+    """
+    if len(requests_data) <= max_urls:
+        return requests_data
+    other = requests_data.pop(OTHER_URL, None)
+    evicted_floor = other.count_error if other is not None else 0
+    evicted_urls = heapq.nsmallest(
+        len(requests_data) - max_urls + 1,
+        requests_data,
+        key=lambda url: (requests_data[url].eviction_priority, url),
+    )
+    for url in evicted_urls:
+        request = requests_data.pop(url)
+        evicted_floor = max(evicted_floor, request.eviction_priority)
+        if other is None:
+            other = request
+        else:
+            other.merge(request)
+    # Always set here: at least one URL was evicted above.
+    if other is not None:
+        other.count_error = evicted_floor
+        requests_data[OTHER_URL] = other
+    return requests_data
+
+
+def merge_request_data(partial_requests_data: Iterable[RequestsData]) -> RequestsData:
+    partials = list(partial_requests_data)
+    evicted_floors = [get_evicted_floor(partial) for partial in partials]
+    request_data: RequestsData = {}
+    for partial in partials:
+        for url, partial_request in partial.items():
+            request = request_data.get(url)
+            if request is None:
+                request_data[url] = partial_request
+                continue
+            request.merge(partial_request)
+
+    if any(evicted_floors):
+        # A URL missing from a capped partial may have had up to that
+        # partial's floor of hits there; OTHER_URL already summed the floors.
+        for url, request in request_data.items():
+            if url == OTHER_URL:
                 continue
-            request_data[url] = {"count": 1, "times": [float(request_time)]}
+            request.count_error += sum(
+                floor
+                for partial, floor in zip(partials, evicted_floors)
+                if url not in partial
+            )
     return request_data
 
 
 def generate_report_data(
     time_stats: dict,
-    requests_data: dict,
+    requests_data: RequestsData,
     time_percentiles: Dict[str, float],
     count_percentiles: Dict[str, float],
 ):
     reports = []
-    for url, data in requests_data.items():
+    for url, request in requests_data.items():
         report = {
-            "count": data["count"],
+            "count": request.count,
             "url": url,
             "count_perc": float(f"{count_percentiles.get(url):.10f}"),
             "time_perc": float(f"{time_percentiles.get(url):.10f}"),
@@ -54,31 +145,75 @@ def generate_report_data(
             "time_med": float(f'{time_stats[url]["med"]:.10f}'),
             "time_max": float(f'{time_stats[url]["max"]:.10f}'),
         }
+        for stat_name, value in time_stats[url].items():
+            if stat_name.startswith("p"):
+                report[f"time_{stat_name}"] = float(f"{value:.10f}")
         reports.append(report)
     return reports
 
 
-def generate_reports(log_file: TextIO, search_pattern: re.Pattern):
-    log_data = [extract_log_data(line, search_pattern) for line in log_file.readlines()]
-    requests_data = collect_request_data(log_data)
+def generate_reports(
+    log_file: Iterable,
+    search_pattern: re.Pattern,
+    debug_sample_rate: float = 0.0,
+    new_times: Callable[[], Times] = new_timings_buffer,
+    percentiles: Iterable[int] = (),
+    report_size: Optional[int] = None,
+):
+    log_data = iter_log_data(log_file, search_pattern, debug_sample_rate)
+    requests_data = collect_request_data(log_data, new_times)
+    return build_reports(requests_data, percentiles, report_size)
+
+
+def select_top_requests(
+    requests_data: RequestsData, report_size: Optional[int]
+) -> RequestsData:
+    if report_size is None or report_size >= len(requests_data):
+        return requests_data
+    # Equal sums are ordered by URL so the result does not depend on the
+    # order shards or checkpoints were merged in.
+    return dict(
+        heapq.nsmallest(
+            report_size,
+            requests_data.items(),
+            key=lambda item: (-item[1].time_sum, item[0]),
+        )
+    )
 
-    requests_total_count = count_total(requests_data, "count")
-    requests_total_times_count = count_total(requests_data, "times")
+
+def build_reports(
+    requests_data: RequestsData,
+    percentiles: Iterable[int] = (),
+    report_size: Optional[int] = None,
+    total_count: Optional[int] = None,
+    total_time: Optional[float] = None,
+) -> list:
+    settle_time_sums(requests_data)
+    requests_total_count = (
+        count_total(requests_data, "count") if total_count is None else total_count
+    )
+    requests_total_times_count = (
+        count_total(requests_data, "time_sum") if total_time is None else total_time
+    )
+
+    with timing_span("select_top", items=len(requests_data)):
+        top_requests_data = select_top_requests(requests_data, report_size)
 
     requests_count_percentiles = generate_percentiles_report(
-        requests_data, "count", requests_total_count
+        top_requests_data, "count", requests_total_count
     )
     requests_time_percentiles = generate_percentiles_report(
-        requests_data, "times", requests_total_times_count
+        top_requests_data, "time_sum", requests_total_times_count
     )
 
-    time_statistics = count_time_statistics(requests_data)
+    with timing_span("time_statistics", items=len(top_requests_data)):
+        time_statistics = count_time_statistics(top_requests_data, percentiles)
 
     reports = generate_report_data(
         time_statistics,
-        requests_data,
-        requests_count_percentiles,
+        top_requests_data,
         requests_time_percentiles,
+        requests_count_percentiles,
     )
     return reports
 
@@ -93,17 +228,67 @@ def generate_report_file_name(file_date: str) -> str:
     return f"/report-{date.strftime('%Y.%m.%d')}.html"
 
 
-def generate_report_file(reports: list, config: dict, latest_log_file_date: str) -> None:
-    report_file_name = generate_report_file_name(latest_log_file_date)
+def generate_report_path(config: dict, file_date: str) -> str:
+    return config.get("REPORT_DIR", "") + generate_report_file_name(file_date)
+
 
-    with open(config["TEMPLATE_FILE"], "r", encoding="utf-8") as file:
-        template_html = file.read()
+def generate_period_key(file_date: str, period: str) -> str:
+    date = datetime.strptime(file_date, "%Y%m%d")
+    if period == "week":
+        year, week, _ = date.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return date.strftime("%Y.%m")
+    raise ValueError(f"Unknown report period: {period}")
+
+
+def generate_period_report_path(config: dict, period_key: str) -> str:
+    return config.get("REPORT_DIR", "") + f"/report-{period_key}.html"
+
+
+def is_report_up_to_date(report_path: str, log_file_name: str) -> bool:
+    try:
+        report_mtime = os.stat(report_path).st_mtime_ns
+        log_file_mtime = os.stat(log_file_name).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    return report_mtime >= log_file_mtime
+
+
+def generate_report_file(reports: list, config: dict, latest_log_file_date: str) -> None:
+    output_path = generate_report_path(config, latest_log_file_date)
+    write_report_file(reports, config["TEMPLATE_FILE"], output_path)
 
-    json_data = json.dumps(reports, indent=2, ensure_ascii=False)
 
-    updated_html = template_html.replace("$table_json", json_data)
+def write_report_file(
+    reports: Iterable[dict], template_path: str, output_path: str
+) -> None:
+    """Stream the report rows into the template's ``$table_json`` slot.
 
-    output_path = config.get("REPORT_DIR", "") + report_file_name
+    Rows are encoded in chunks straight into a temporary file, which then
+    replaces ``output_path``, so a failed run never leaves half a report.
+    """
+    with open(template_path, "r", encoding="utf-8") as file:
+        template_head, _, template_tail = file.read().partition(TABLE_PLACEHOLDER)
 
-    with open(output_path, "w", encoding="utf-8") as file:
-        file.write(updated_html)
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    with (
+        timing_span("render", items=0) as span,
+        atomic_write(output_path, "w", encoding="utf-8") as file,
+    ):
+        file.write(template_head)
+        file.write("[")
+        chunk = []
+        separator = ""
+        index = 0
+        for index, report in enumerate(reports, 1):
+            chunk.append(encoder.encode(report))
+            if len(chunk) == REPORT_WRITE_CHUNK_SIZE:
+                file.write(separator + ",".join(chunk))
+                chunk.clear()
+                separator = ","
+        span.items = index
+        if chunk:
+            file.write(separator + ",".join(chunk))
+        file.write("]")
+        file.write(template_tail)
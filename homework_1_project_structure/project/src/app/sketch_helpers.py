@@ -0,0 +1,104 @@
+import math
+import random
+from statistics import median
+from typing import Iterable, List, Tuple, Union
+
+KLL_COMPACTOR_RATIO = 2 / 3
+KLL_ERROR_FACTOR = 1.65
+KLL_MIN_K = 8
+
+
+def sketch_k_for_error(error: float) -> int:
+    return max(KLL_MIN_K, math.ceil(KLL_ERROR_FACTOR / error))
+
+
+class KLLSketch:
+    """KLL quantile sketch over request times.
+
+    Keeps O(k) values per URL regardless of how many are added; quantiles
+    are within roughly 1.65 / k in rank. Until the first compaction every
+    value is kept, so small inputs are answered exactly.
+    """
+
+    def __init__(self, k: int = 200) -> None:
+        self.k = k
+        self.compactors: List[List[float]] = [[]]
+        self.retained = 0
+        self.capacity = self.level_capacity(0)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def level_capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(KLL_COMPACTOR_RATIO**depth * self.k)) + 1
+
+    def grow(self) -> None:
+        self.compactors.append([])
+        self.capacity = sum(
+            self.level_capacity(level) for level in range(len(self.compactors))
+        )
+
+    def compress(self) -> None:
+        for level, compactor in enumerate(self.compactors):
+            if len(compactor) < self.level_capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self.grow()
+            compactor.sort()
+            leftover = [compactor.pop()] if len(compactor) % 2 else []
+            offset = random.getrandbits(1)
+            promoted = compactor[offset::2]
+            self.compactors[level + 1].extend(promoted)
+            self.compactors[level] = leftover
+            self.retained -= len(compactor) - len(promoted)
+            if self.retained < self.capacity:
+                return
+
+    def append(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self.retained += 1
+        self.count += 1
+        if self.retained >= self.capacity:
+            self.compress()
+
+    def extend(self, values: Union["KLLSketch", Iterable[float]]) -> None:
+        if not isinstance(values, KLLSketch):
+            for value in values:
+                self.append(value)
+            return
+        while len(self.compactors) < len(values.compactors):
+            self.grow()
+        for level, compactor in enumerate(values.compactors):
+            self.compactors[level].extend(compactor)
+        self.retained += values.retained
+        self.count += values.count
+        while self.retained >= self.capacity:
+            self.compress()
+
+    def is_exact(self) -> bool:
+        return len(self.compactors) == 1
+
+    def weighted_values(self) -> List[Tuple[float, int]]:
+        return sorted(
+            (value, 1 << level)
+            for level, compactor in enumerate(self.compactors)
+            for value in compactor
+        )
+
+    def quantile(self, fraction: float) -> float:
+        weighted_values = self.weighted_values()
+        total_weight = sum(weight for _, weight in weighted_values)
+        target_rank = max(1, math.ceil(fraction * total_weight))
+        rank = 0
+        for value, weight in weighted_values:
+            rank += weight
+            if rank >= target_rank:
+                return value
+        raise ValueError("quantile of an empty sketch")
+
+    def median(self) -> float:
+        if self.is_exact():
+            return median(self.compactors[0])
+        return self.quantile(0.5)
@@ -0,0 +1,60 @@
+import dataclasses
+import re
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+NUMERIC_SEGMENT_PATTERN = re.compile(r"(?<=/)\d+(?=[/?]|$)")
+UUID_SEGMENT_PATTERN = re.compile(
+    r"(?<=/)[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-"
+    r"[0-9a-fA-F]{12}(?=[/?]|$)"
+)
+ID_PLACEHOLDER = "{id}"
+UUID_PLACEHOLDER = "{uuid}"
+NORMALIZED_URLS_CACHE_SIZE = 1 << 16
+
+
+@dataclasses.dataclass
+class UrlNormalizer:
+    """Map raw request URLs to the keys they are aggregated under.
+
+    Results are memoized, since the same raw URLs keep repeating in a log.
+    """
+
+    strip_query: bool = True
+    collapse_ids: bool = True
+    cache: Dict[str, str] = dataclasses.field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    def normalize(self, url: str) -> str:
+        if self.strip_query:
+            url = url.split("?", 1)[0]
+        if self.collapse_ids:
+            url = UUID_SEGMENT_PATTERN.sub(UUID_PLACEHOLDER, url)
+            url = NUMERIC_SEGMENT_PATTERN.sub(ID_PLACEHOLDER, url)
+        return url
+
+    def __call__(self, url: str) -> str:
+        normalized_url = self.cache.get(url)
+        if normalized_url is None:
+            if len(self.cache) >= NORMALIZED_URLS_CACHE_SIZE:
+                self.cache.clear()
+            normalized_url = self.cache[url] = self.normalize(url)
+        return normalized_url
+
+
+def create_url_normalizer(config: dict) -> Optional[UrlNormalizer]:
+    strip_query = config.get("URL_STRIP_QUERY", False)
+    collapse_ids = config.get("URL_COLLAPSE_IDS", False)
+    if not strip_query and not collapse_ids:
+        return None
+    return UrlNormalizer(strip_query=strip_query, collapse_ids=collapse_ids)
+
+
+def normalize_log_data(
+    log_data: Iterable[Optional[Tuple[str, Union[str, bytes]]]],
+    normalize_url: UrlNormalizer,
+) -> Iterator[Optional[Tuple[str, Union[str, bytes]]]]:
+    for data in log_data:
+        if data:
+            url, request_time = data
+            yield normalize_url(url), request_time
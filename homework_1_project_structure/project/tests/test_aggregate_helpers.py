@@ -0,0 +1,79 @@
+import os
+from array import array
+from pathlib import Path
+
+import pytest
+from src.app.aggregate_helpers import (
+    generate_aggregate_path,
+    generate_reports_from_aggregate,
+    load_aggregate_requests_data,
+    write_aggregate_file,
+)
+from src.app.report_helpers import build_reports, collect_request_data
+from src.app.sketch_helpers import KLLSketch
+
+
+def make_requests_data(new_times) -> dict:
+    log_data = [
+        (f"/url{index % 7}/ü", f"{index % 13}.{index:03d}") for index in range(500)
+    ]
+    return collect_request_data(log_data, new_times)
+
+
+def test_generate_aggregate_path() -> None:
+    assert generate_aggregate_path({"AGGREGATE_DIR": "/agg"}, "20231010") == (
+        "/agg/aggregate-20231010.agg"
+    )
+
+
+def test_aggregate_round_trip_exact(tmp_path: Path) -> None:
+    aggregate_path = str(tmp_path / "aggregate.agg")
+    requests_data = make_requests_data(lambda: array("d"))
+    next(iter(requests_data.values())).count_error = 7
+    write_aggregate_file(aggregate_path, requests_data, "20231010")
+
+    assert load_aggregate_requests_data(aggregate_path) == ("20231010", requests_data)
+    assert not os.path.exists(f"{aggregate_path}.tmp")
+
+
+def test_aggregate_round_trip_sketch(tmp_path: Path) -> None:
+    aggregate_path = str(tmp_path / "aggregate.agg")
+    requests_data = make_requests_data(lambda: KLLSketch(8))
+    write_aggregate_file(aggregate_path, requests_data, "20231010")
+
+    _, loaded = load_aggregate_requests_data(aggregate_path)
+
+    assert list(loaded) == list(requests_data)
+    for url, request in requests_data.items():
+        loaded_times = loaded[url].times
+        assert isinstance(loaded_times, KLLSketch)
+        assert isinstance(request.times, KLLSketch)
+        assert loaded[url].count == request.count
+        assert loaded_times.compactors == request.times.compactors
+        assert loaded_times.median() == request.times.median()
+
+
+def test_generate_reports_from_aggregate(tmp_path: Path) -> None:
+    aggregate_path = str(tmp_path / "aggregate.agg")
+    requests_data = make_requests_data(lambda: array("d"))
+    write_aggregate_file(aggregate_path, requests_data, "20231010")
+
+    file_date, reports = generate_reports_from_aggregate(
+        aggregate_path, percentiles=[90], report_size=3
+    )
+
+    assert file_date == "20231010"
+    assert reports == build_reports(requests_data, [90], report_size=3)
+
+
+def test_read_aggregate_file_rejects_other_files(tmp_path: Path) -> None:
+    aggregate_path = tmp_path / "aggregate.agg"
+    aggregate_path.write_bytes(b"not an aggregate")
+    with pytest.raises(ValueError):
+        load_aggregate_requests_data(str(aggregate_path))
+
+
+def test_aggregate_of_empty_requests_data(tmp_path: Path) -> None:
+    aggregate_path = str(tmp_path / "aggregate.agg")
+    write_aggregate_file(aggregate_path, {}, "20231010")
+    assert load_aggregate_requests_data(aggregate_path) == ("20231010", {})
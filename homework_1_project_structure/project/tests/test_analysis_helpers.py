@@ -0,0 +1,212 @@
+import gzip
+import json
+import pickle
+from pathlib import Path
+
+import pytest
+from src.app.analysis_helpers import (
+    backfill_reports,
+    collect_log_file_request_data,
+    collect_log_file_request_data_incremental,
+    generate_config_reports,
+)
+from src.app.checkpoint_helpers import get_checkpoint_path, load_checkpoint
+from src.app.exceptions import ParseErrorBudgetExceeded
+
+
+def write_log_lines(lines_count: int) -> bytes:
+    return b"".join(
+        (
+            "127.0.0.1 - - [10/Oct/2023:13:55:36 +0000] "
+            f'"GET /url{index % 5} HTTP/1.1" 200 1234 "-" "curl/7.64.1" '
+            f"{index % 10}.{index % 1000:03d}\n"
+        ).encode()
+        for index in range(lines_count)
+    )
+
+
+def test_collect_log_file_request_data_same_for_all_inputs(tmp_path: Path) -> None:
+    content = write_log_lines(300)
+    plain_path = tmp_path / "nginx-access-ui.log-20231010"
+    plain_path.write_bytes(content)
+    gzip_path = tmp_path / "nginx-access-ui.log-20231011.gz"
+    gzip_path.write_bytes(gzip.compress(content))
+    config = {"REPORT_SIZE": 3}
+
+    serial = collect_log_file_request_data(str(plain_path), config)
+    parallel = collect_log_file_request_data(str(plain_path), config, workers=2)
+    compressed = collect_log_file_request_data(str(gzip_path), config)
+
+    assert serial == compressed
+    assert len(serial) == 5
+    for url, request in serial.items():
+        assert parallel[url].times == request.times
+        assert parallel[url].count == request.count
+        assert parallel[url].time_max == request.time_max
+    assert generate_config_reports(serial, config) == generate_config_reports(
+        parallel, config
+    )
+
+
+def test_generate_config_reports_honors_report_size(tmp_path: Path) -> None:
+    plain_path = tmp_path / "nginx-access-ui.log-20231010"
+    plain_path.write_bytes(write_log_lines(300))
+    config = {"REPORT_SIZE": 2, "TIME_PERCENTILES": [95]}
+
+    requests_data = collect_log_file_request_data(str(plain_path), config)
+    reports = generate_config_reports(requests_data, config)
+
+    assert len(reports) == 2
+    assert reports[0]["time_sum"] >= reports[1]["time_sum"]
+    assert "time_p95" in reports[0]
+
+
+def test_collect_log_file_request_data_incremental(tmp_path: Path) -> None:
+    content = write_log_lines(200)
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    config = {"REPORT_DIR": str(tmp_path)}
+    partial_line = b'127.0.0.1 - - "GET /url9 HTTP/1.1" 200 1'
+
+    log_path.write_bytes(content[:3000] + partial_line)
+    first_run = collect_log_file_request_data_incremental(str(log_path), config)
+    checkpoint = load_checkpoint(get_checkpoint_path(config))
+    assert checkpoint is not None
+    assert checkpoint.offset == content.rindex(b"\n", 0, 3000) + 1
+    assert sum(request.count for request in first_run.values()) == (
+        content[:3000].count(b"\n")
+    )
+
+    with open(log_path, "wb") as log_file:
+        log_file.write(content + partial_line + b".500\n")
+    second_run = collect_log_file_request_data_incremental(str(log_path), config)
+
+    log_path.write_bytes(content + partial_line + b".500\n")
+    full_run = collect_log_file_request_data(str(log_path), config)
+    assert list(second_run) == list(full_run)
+    for url, request in full_run.items():
+        assert second_run[url].times == request.times
+        assert second_run[url].count == request.count
+
+
+def test_collect_log_file_request_data_incremental_restarts_on_rotation(
+    tmp_path: Path,
+) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    config = {"REPORT_DIR": str(tmp_path)}
+    log_path.write_bytes(write_log_lines(50))
+    collect_log_file_request_data_incremental(str(log_path), config)
+
+    log_path.unlink()
+    log_path.write_bytes(write_log_lines(10))
+    result = collect_log_file_request_data_incremental(str(log_path), config)
+
+    assert sum(request.count for request in result.values()) == 10
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_collect_log_file_request_data_parse_error_budget(
+    tmp_path: Path, workers: int
+) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    log_path.write_bytes(write_log_lines(90) + b"malformed line\n" * 10)
+
+    result = collect_log_file_request_data(
+        str(log_path), {"MAX_PARSE_ERROR_RATIO": 0.1}, workers
+    )
+    assert sum(request.count for request in result.values()) == 90
+
+    with pytest.raises(ParseErrorBudgetExceeded) as err:
+        collect_log_file_request_data(
+            str(log_path), {"MAX_PARSE_ERROR_RATIO": 0.05}, workers
+        )
+    assert (err.value.error_lines, err.value.total_lines) == (10, 100)
+
+
+def read_report_rows(report_path: Path) -> list:
+    report_html = report_path.read_text(encoding="utf-8")
+    table_json = report_html.split("var table = ", 1)[1].split(";\n", 1)[0]
+    return json.loads(table_json)
+
+
+def test_backfill_reports_daily_and_monthly(tmp_path: Path) -> None:
+    log_dir = tmp_path / "log"
+    report_dir = tmp_path / "reports"
+    log_dir.mkdir()
+    report_dir.mkdir()
+    (log_dir / "nginx-access-ui.log-20231030").write_bytes(write_log_lines(100))
+    (log_dir / "nginx-access-ui.log-20231031.gz").write_bytes(
+        gzip.compress(write_log_lines(50))
+    )
+    (log_dir / "nginx-access-ui.log-20231101").write_bytes(write_log_lines(20))
+    config = {
+        "LOG_DIR": str(log_dir),
+        "REPORT_DIR": str(report_dir),
+        "REPORT_SIZE": 1000,
+        "TEMPLATE_FILE": str(Path(__file__).parent.parent / "report.html"),
+    }
+
+    backfill_reports(config, workers=2, merge_period="month")
+
+    assert sorted(path.name for path in report_dir.iterdir()) == [
+        "report-2023.10.30.html",
+        "report-2023.10.31.html",
+        "report-2023.10.html",
+        "report-2023.11.01.html",
+        "report-2023.11.html",
+    ]
+    october_rows = read_report_rows(report_dir / "report-2023.10.html")
+    assert sum(row["count"] for row in october_rows) == 150
+    november_rows = read_report_rows(report_dir / "report-2023.11.html")
+    assert november_rows == read_report_rows(report_dir / "report-2023.11.01.html")
+
+
+def test_backfill_reports_skips_unparsable_log(tmp_path: Path) -> None:
+    log_dir = tmp_path / "log"
+    report_dir = tmp_path / "reports"
+    log_dir.mkdir()
+    report_dir.mkdir()
+    (log_dir / "nginx-access-ui.log-20231029").write_bytes(write_log_lines(30))
+    (log_dir / "nginx-access-ui.log-20231030").write_bytes(b"malformed line\n" * 10)
+    (log_dir / "nginx-access-ui.log-20231031").write_bytes(write_log_lines(20))
+    config = {
+        "LOG_DIR": str(log_dir),
+        "REPORT_DIR": str(report_dir),
+        "REPORT_SIZE": 1000,
+        "TEMPLATE_FILE": str(Path(__file__).parent.parent / "report.html"),
+        "MAX_PARSE_ERROR_RATIO": 0.2,
+    }
+
+    backfill_reports(config, workers=2, merge_period="month")
+
+    assert sorted(path.name for path in report_dir.iterdir()) == [
+        "report-2023.10.29.html",
+        "report-2023.10.31.html",
+        "report-2023.10.html",
+    ]
+    october_rows = read_report_rows(report_dir / "report-2023.10.html")
+    assert sum(row["count"] for row in october_rows) == 50
+
+
+def test_parse_error_budget_exceeded_survives_pickling() -> None:
+    err = pickle.loads(pickle.dumps(ParseErrorBudgetExceeded(1, 2, 0.2)))
+
+    assert (err.error_lines, err.total_lines, err.max_error_ratio) == (1, 2, 0.2)
+    assert str(err) == str(ParseErrorBudgetExceeded(1, 2, 0.2))
+
+
+def test_backfill_reports_skips_up_to_date_reports(tmp_path: Path) -> None:
+    log_dir = tmp_path / "log"
+    report_dir = tmp_path / "reports"
+    log_dir.mkdir()
+    report_dir.mkdir()
+    (log_dir / "nginx-access-ui.log-20231030").write_bytes(write_log_lines(10))
+    (report_dir / "report-2023.10.30.html").write_text("existing")
+    config = {
+        "LOG_DIR": str(log_dir),
+        "REPORT_DIR": str(report_dir),
+        "TEMPLATE_FILE": str(Path(__file__).parent.parent / "report.html"),
+    }
+
+    backfill_reports(config, since="20231001", until="20231031")
+
+    assert (report_dir / "report-2023.10.30.html").read_text() == "existing"
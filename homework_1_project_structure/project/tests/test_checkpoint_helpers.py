@@ -0,0 +1,75 @@
+import os
+from array import array
+from pathlib import Path
+
+from src.app.checkpoint_helpers import (
+    Checkpoint,
+    find_complete_lines_end,
+    get_checkpoint_path,
+    get_checkpoint_settings,
+    load_checkpoint,
+    save_checkpoint,
+)
+from src.app.math_helpers import RequestAccumulator
+
+
+def test_get_checkpoint_path() -> None:
+    assert get_checkpoint_path({"REPORT_DIR": "/reports"}) == (
+        "/reports/.log-analyzer-checkpoint.pickle"
+    )
+    assert get_checkpoint_path({"CHECKPOINT_FILE": "/tmp/state"}) == "/tmp/state"
+
+
+def test_save_and_load_checkpoint(tmp_path: Path) -> None:
+    checkpoint_path = str(tmp_path / "checkpoint")
+    checkpoint = Checkpoint(
+        log_file_name="/log/nginx-access-ui.log-20231010",
+        inode=42,
+        offset=100,
+        settings={"TIME_STATS_MODE": "exact"},
+        requests_data={"/url": RequestAccumulator(array("d", [1.0]), 1, 1.0, 1.0)},
+    )
+    save_checkpoint(checkpoint_path, checkpoint)
+
+    assert load_checkpoint(checkpoint_path) == checkpoint
+    assert not os.path.exists(f"{checkpoint_path}.tmp")
+
+
+def test_load_checkpoint_missing_or_corrupted(tmp_path: Path) -> None:
+    checkpoint_path = tmp_path / "checkpoint"
+    assert load_checkpoint(str(checkpoint_path)) is None
+    checkpoint_path.write_bytes(b"garbage")
+    assert load_checkpoint(str(checkpoint_path)) is None
+
+
+def test_checkpoint_can_resume(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    log_path.write_bytes(b"line\n" * 10)
+    stat = os.stat(log_path)
+    settings = get_checkpoint_settings({"TIME_STATS_MODE": "exact", "MAX_URLS": 10})
+    checkpoint = Checkpoint(str(log_path), stat.st_ino, 25, settings, {})
+
+    assert checkpoint.can_resume(str(log_path), stat, settings)
+    assert not checkpoint.can_resume(str(tmp_path / "other"), stat, settings)
+    for changed_settings in (
+        {"TIME_STATS_MODE": "approximate", "MAX_URLS": 10},
+        {"TIME_STATS_MODE": "exact", "MAX_URLS": 20},
+        {"TIME_STATS_MODE": "exact", "MAX_URLS": 10, "URL_STRIP_QUERY": True},
+        {"TIME_STATS_MODE": "exact", "MAX_URLS": 10, "URL_COLLAPSE_IDS": True},
+    ):
+        assert not checkpoint.can_resume(
+            str(log_path), stat, get_checkpoint_settings(changed_settings)
+        )
+
+    log_path.write_bytes(b"line\n")
+    assert not checkpoint.can_resume(str(log_path), os.stat(log_path), settings)
+
+
+def test_find_complete_lines_end(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    log_path.write_bytes(b"first\nsecond\nthi")
+    size = os.path.getsize(log_path)
+
+    assert find_complete_lines_end(str(log_path), 0, size) == 13
+    assert find_complete_lines_end(str(log_path), 13, size) == 13
+    assert find_complete_lines_end(str(log_path), 0, 6) == 6
@@ -0,0 +1,43 @@
+import os
+from pathlib import Path
+
+import pytest
+from src.app.file_helpers import FILE_MODE, atomic_write
+
+
+def test_atomic_write_replaces_file(tmp_path: Path) -> None:
+    path = tmp_path / "report.html"
+    path.write_text("old")
+
+    with atomic_write(str(path)) as file:
+        file.write("new")
+        assert path.read_text() == "old"
+
+    assert path.read_text() == "new"
+    assert os.listdir(tmp_path) == [path.name]
+    assert os.stat(path).st_mode & 0o777 == FILE_MODE
+
+
+def test_atomic_write_uses_distinct_temporary_files(tmp_path: Path) -> None:
+    path = tmp_path / "report.html"
+
+    with atomic_write(str(path)) as first, atomic_write(str(path)) as second:
+        assert first.name != second.name
+        first.write("first")
+        second.write("second")
+
+    assert path.read_text() == "first"
+    assert os.listdir(tmp_path) == [path.name]
+
+
+def test_atomic_write_removes_temporary_file_on_error(tmp_path: Path) -> None:
+    path = tmp_path / "checkpoint.pickle"
+    path.write_bytes(b"old")
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path), "wb") as file:
+            file.write(b"partial")
+            raise RuntimeError("write failed")
+
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == [path.name]
@@ -0,0 +1,97 @@
+import gzip
+import struct
+import zlib
+from pathlib import Path
+from typing import List
+
+import pytest
+from src.app.gzip_helpers import (
+    find_gzip_members,
+    iter_gzip_chunks,
+    iter_gzip_log_lines,
+    iter_lines,
+)
+
+
+def build_bgzf_member(data: bytes) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    block_size = 12 + 6 + len(deflated) + 8
+    header = b"\x1f\x8b\x08\x04" + b"\x00" * 4 + b"\x00\xff"
+    extra = struct.pack("<H", 6) + b"BC" + struct.pack("<HH", 2, block_size - 1)
+    trailer = struct.pack("<II", zlib.crc32(data), len(data))
+    return header + extra + deflated + trailer
+
+
+def make_lines(lines_count: int) -> List[bytes]:
+    return [f"line {index}".encode() for index in range(lines_count)]
+
+
+def test_iter_lines_joins_lines_split_across_chunks() -> None:
+    chunks = [b"first li", b"ne\nsecond", b" line\nthird line"]
+    assert list(iter_lines(chunks)) == [b"first line", b"second line", b"third line"]
+
+
+def test_iter_gzip_log_lines_plain_gzip(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010.gz"
+    lines = make_lines(1000)
+    with gzip.open(log_path, "wb") as log_file:
+        log_file.write(b"\n".join(lines) + b"\n")
+
+    assert list(iter_gzip_log_lines(str(log_path), workers=4)) == lines
+
+
+def test_iter_gzip_log_lines_concatenated_members(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010.gz"
+    lines = make_lines(300)
+    log_path.write_bytes(
+        gzip.compress(b"\n".join(lines[:100]) + b"\n")
+        + gzip.compress(b"\n".join(lines[100:]) + b"\n")
+    )
+
+    with open(log_path, "rb") as log_file:
+        assert find_gzip_members(log_file) is None
+    assert list(iter_gzip_log_lines(str(log_path))) == lines
+
+
+def test_iter_gzip_log_lines_blocked_members(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010.gz"
+    lines = make_lines(5000)
+    content = b"\n".join(lines) + b"\n"
+    blocks = [
+        content[start:end]
+        for start, end in zip(range(0, len(content), 4096), range(4096, 1 << 30, 4096))
+    ]
+    log_path.write_bytes(b"".join(build_bgzf_member(block) for block in blocks))
+
+    with open(log_path, "rb") as log_file:
+        members = find_gzip_members(log_file)
+    assert members is not None
+    assert len(members) == len(blocks)
+    assert list(iter_gzip_log_lines(str(log_path), workers=4)) == lines
+
+
+def test_iter_gzip_chunks_reraises_reader_errors(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010.gz"
+    log_path.write_bytes(b"not a gzip file")
+
+    with pytest.raises(zlib.error):
+        list(iter_gzip_chunks(str(log_path)))
+
+
+def test_iter_gzip_log_lines_rejects_truncated_file(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010.gz"
+    compressed = gzip.compress(b"\n".join(make_lines(1000)) + b"\n")
+    log_path.write_bytes(compressed[: len(compressed) // 2])
+
+    with pytest.raises(EOFError):
+        list(iter_gzip_log_lines(str(log_path)))
+
+
+def test_iter_gzip_chunks_stops_reader_when_abandoned(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010.gz"
+    log_path.write_bytes(gzip.compress(b"x" * (64 << 20)))
+
+    chunks = iter_gzip_chunks(str(log_path))
+    assert next(chunks)
+    chunks.close()
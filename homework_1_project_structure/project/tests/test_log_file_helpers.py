@@ -1,13 +1,23 @@
+import os
 import re
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import pytest
+from src.app.exceptions import ParseErrorBudgetExceeded
 from src.app.log_file_helpers import (
+    ParseStats,
     collect_log_file_names,
     extract_log_data,
+    extract_log_data_bytes,
     find_log_file_name_and_date,
+    find_log_files,
     get_latest_log_file,
+    iter_log_data,
+    iter_mmap_log_lines,
     validate_log_file_names,
 )
+from src.app.regex_helpers import generate_bytes_search_pattern
 
 
 def test_extract_log_data_valid() -> None:
@@ -29,25 +39,146 @@ def test_extract_log_data_invalid() -> None:
     assert result is None
 
 
-@patch("os.listdir")
-def test_collect_log_file_names(mock_listdir: MagicMock) -> None:
-    mock_listdir.return_value = [
-        "nginx-access-ui.log-20231010",
-        "nginx-access-ui.log-20231009.gz",
+def test_extract_log_data_bytes_valid() -> None:
+    log_line = (
+        b"127.0.0.1 - - [10/Oct/2023:13:55:36 +0000] "
+        b'"GET /api/v1/resource HTTP/1.1" 200 1234 "-" '
+        b'"curl/7.64.1" '
+        b"0.005\n"
+    )
+    result = extract_log_data_bytes(log_line, generate_bytes_search_pattern())
+    assert result == ("/api/v1/resource", b"0.005")
+
+
+def test_extract_log_data_bytes_invalid() -> None:
+    log_line = b'127.0.0.1 - - "GET /api/v1/resource HTTP/2.0" 200 "-" 0.005\n'
+    result = extract_log_data_bytes(log_line, generate_bytes_search_pattern())
+    assert result is None
+
+
+def test_extract_log_data_bytes_matches_str_pattern() -> None:
+    log_lines = [
+        '1.1.1.1 - - [29/Jun/2017:03:50:22 +0300] "GET /api/v2/banner/1 HTTP/1.1" '
+        '200 927 "-" "Lynx/2.8.8dev.9" "-" "1498697422-2190034393" "dc7161be3" 0.390',
+        '1.1.1.1 - - [29/Jun/2017:03:50:22 +0300] "POST /api/1/?id=2 HTTP/1.0" '
+        '200 12 "-" "-" "-" "-" "-" 12.001',
+        '1.1.1.1 - - [29/Jun/2017:03:50:22 +0300] "0" 400 166 "-" "-" "-" "-" 0.000',
+        '1.1.1.1 - - [29/Jun/2017:03:50:22 +0300] "GET /api/1 HTTP/1.1" 200 12 "-" -',
     ]
-    log_folder = "/path/to/logs"
-    result = collect_log_file_names(log_folder)
-    assert result == [
-        "nginx-access-ui.log-20231010",
+    str_pattern = re.compile(r"\"([A-Z]+) (/[^\s]+) HTTP/1\.[01]\"\s.*\s(\d+\.\d+)$")
+    bytes_pattern = generate_bytes_search_pattern()
+    for log_line in log_lines:
+        expected = extract_log_data(log_line, str_pattern)
+        result = extract_log_data_bytes(log_line.encode() + b"\n", bytes_pattern)
+        if expected is None:
+            assert result is None
+        else:
+            assert result == (expected[0], expected[1].encode())
+
+
+@patch("src.app.log_file_helpers.logger")
+def test_iter_log_data_skips_logging_without_sample_rate(mock_logger: MagicMock) -> None:
+    log_lines = [b'"GET /url HTTP/1.1" 200 1.0'] * 10
+    result = list(iter_log_data(log_lines, generate_bytes_search_pattern()))
+    assert result == [("/url", b"1.0")] * 10
+    mock_logger.debug.assert_not_called()
+
+
+@patch("src.app.log_file_helpers.logger")
+def test_iter_log_data_samples_debug_logging(mock_logger: MagicMock) -> None:
+    log_lines = [b'"GET /url HTTP/1.1" 200 1.0'] * 10
+    result = list(
+        iter_log_data(log_lines, generate_bytes_search_pattern(), debug_sample_rate=0.2)
+    )
+    assert result == [("/url", b"1.0")] * 10
+    assert mock_logger.debug.call_count == 2
+
+
+@pytest.mark.parametrize("debug_sample_rate", [0.0, 0.5])
+def test_iter_log_data_counts_unparsed_lines(debug_sample_rate: float) -> None:
+    log_lines = [b'"GET /url HTTP/1.1" 200 1.0', b"garbage\n"] * 5
+    parse_stats = ParseStats()
+
+    result = list(
+        iter_log_data(
+            log_lines, generate_bytes_search_pattern(), debug_sample_rate, parse_stats
+        )
+    )
+
+    assert result == [("/url", b"1.0"), None] * 5
+    assert (parse_stats.total_lines, parse_stats.error_lines) == (10, 5)
+    assert parse_stats.samples == ["garbage"] * 5
+
+
+def test_parse_stats_reservoir_is_bounded_and_seeded() -> None:
+    first, second = ParseStats(sample_size=3), ParseStats(sample_size=3)
+    for index in range(100):
+        first.record_error(f"line {index}")
+        second.record_error(f"line {index}")
+
+    assert first.error_lines == 100
+    assert len(first.samples) == 3
+    assert first.samples == second.samples
+
+
+def test_parse_stats_merge() -> None:
+    first, second = ParseStats(total_lines=10), ParseStats(total_lines=30)
+    first.record_error(b"first\n")
+    for _ in range(20):
+        second.record_error(b"second\n")
+
+    first.merge(second)
+
+    assert (first.total_lines, first.error_lines) == (40, 21)
+    assert len(first.samples) == 10
+    assert set(first.samples) <= {"first", "second"}
+
+
+def test_parse_stats_check_error_budget() -> None:
+    parse_stats = ParseStats(total_lines=10)
+    parse_stats.record_error("bad")
+    parse_stats.record_error("bad")
+
+    parse_stats.check_error_budget(None)
+    parse_stats.check_error_budget(0.2)
+    with pytest.raises(ParseErrorBudgetExceeded):
+        parse_stats.check_error_budget(0.1)
+    assert ParseStats().error_ratio == 0.0
+
+
+def test_iter_mmap_log_lines(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    log_path.write_bytes(b"first\nsecond\nthird")
+
+    assert list(iter_mmap_log_lines(str(log_path))) == [
+        b"first\n",
+        b"second\n",
+        b"third",
+    ]
+    assert list(iter_mmap_log_lines(str(log_path), 6, 7)) == [b"second\n"]
+    assert list(iter_mmap_log_lines(str(log_path), 13, 100)) == [b"third"]
+    assert list(iter_mmap_log_lines(str(log_path), 6, 6)) == []
+
+
+def test_iter_mmap_log_lines_empty_file(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    log_path.touch()
+    assert list(iter_mmap_log_lines(str(log_path))) == []
+
+
+def test_collect_log_file_names(tmp_path: Path) -> None:
+    (tmp_path / "nginx-access-ui.log-20231010").touch()
+    (tmp_path / "nginx-access-ui.log-20231009.gz").touch()
+    (tmp_path / "nginx-access-ui.log-20231008").mkdir()
+    result = collect_log_file_names(str(tmp_path))
+    assert sorted(result) == [
         "nginx-access-ui.log-20231009.gz",
+        "nginx-access-ui.log-20231010",
     ]
 
 
-@patch("os.listdir")
-def test_collect_log_file_names_empty_directory(mock_listdir: MagicMock) -> None:
-    mock_listdir.return_value = []
-    log_folder = "/path/to/logs"
-    result = collect_log_file_names(log_folder)
+def test_collect_log_file_names_empty_directory(tmp_path: Path) -> None:
+    result = collect_log_file_names(str(tmp_path))
     assert result == []
 
 
@@ -105,8 +236,9 @@ def test_find_log_file_name_and_date(
     result = find_log_file_name_and_date(config)
     assert result == (
         "/path/to/logs/nginx-access-ui.log-20231010",
-        "20231010.gz",
+        "20231010",
     )
+    mock_get_latest_log_file.assert_called_once_with("/path/to/logs", "20231010.gz")
 
 
 @patch("src.app.log_file_helpers.collect_log_file_names")
@@ -121,3 +253,57 @@ def test_find_log_file_name_and_date_no_logs(
 
     result = find_log_file_name_and_date(config)
     assert result is None
+
+
+def test_find_log_file_name_and_date_skips_unrelated_names(tmp_path: Path) -> None:
+    for file_name in (
+        "nginx-access-ui.log-20231009.gz",
+        "nginx-access-ui.log-20231011.bz2",
+        "nginx-access-ui.log-20231010",
+    ):
+        (tmp_path / file_name).touch()
+    result = find_log_file_name_and_date({"LOG_DIR": str(tmp_path)})
+    assert result == (f"{tmp_path}/nginx-access-ui.log-20231010", "20231010")
+
+
+def test_find_log_file_name_and_date_uses_cached_index(tmp_path: Path) -> None:
+    log_dir = tmp_path / "log"
+    log_dir.mkdir()
+    (log_dir / "nginx-access-ui.log-20231010.gz").touch()
+    config = {"LOG_DIR": str(log_dir), "LOG_INDEX_FILE": str(tmp_path / "index.json")}
+    expected = (f"{log_dir}/nginx-access-ui.log-20231010.gz", "20231010")
+
+    assert find_log_file_name_and_date(config) == expected
+    with patch("src.app.log_file_helpers.collect_log_file_names") as mock_collect:
+        assert find_log_file_name_and_date(config) == expected
+        mock_collect.assert_not_called()
+
+    (log_dir / "nginx-access-ui.log-20231011").touch()
+    os.utime(log_dir, ns=(0, os.stat(log_dir).st_mtime_ns + 1))
+    assert find_log_file_name_and_date(config) == (
+        f"{log_dir}/nginx-access-ui.log-20231011",
+        "20231011",
+    )
+
+
+def test_find_log_files_sorted_and_filtered(tmp_path: Path) -> None:
+    for file_name in (
+        "nginx-access-ui.log-20231012",
+        "nginx-access-ui.log-20231009.gz",
+        "nginx-access-ui.log-20231010.gz",
+        "nginx-access-ui.log-20231011",
+        "other-file.txt",
+    ):
+        (tmp_path / file_name).touch()
+    config = {"LOG_DIR": str(tmp_path)}
+
+    assert [date for _, date in find_log_files(config)] == [
+        "20231009",
+        "20231010",
+        "20231011",
+        "20231012",
+    ]
+    assert find_log_files(config, since="20231010", until="20231011") == [
+        (f"{tmp_path}/nginx-access-ui.log-20231010.gz", "20231010"),
+        (f"{tmp_path}/nginx-access-ui.log-20231011", "20231011"),
+    ]
@@ -0,0 +1,47 @@
+import json
+import logging
+from pathlib import Path
+
+import pytest
+import structlog
+from src.app import logger as logger_module
+from src.app.logger import configure_logging, stop_queue_listener
+
+
+@pytest.fixture
+def restore_logging():
+    root_handlers = logging.getLogger().handlers[:]
+    root_level = logging.getLogger().level
+    yield
+    stop_queue_listener()
+    logging.getLogger().handlers = root_handlers
+    logging.getLogger().setLevel(root_level)
+    structlog.reset_defaults()
+
+
+def test_production_logging_writes_filtered_json(
+    tmp_path: Path, restore_logging
+) -> None:
+    log_path = tmp_path / "analyzer.log"
+    configure_logging(str(log_path), profile="production", level="INFO")
+
+    logger = structlog.get_logger()
+    logger.debug("Extracted log data", log_line="skipped")
+    logger.info("Report generated", report_path="/reports/report.html")
+    assert isinstance(logging.getLogger().handlers[0], logging.handlers.QueueHandler)
+    stop_queue_listener()
+
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["event"] == "Report generated"
+    assert records[0]["level"] == "info"
+    assert records[0]["report_path"] == "/reports/report.html"
+    assert "timestamp" in records[0]
+
+
+def test_write_directly_after_fork(tmp_path: Path, restore_logging) -> None:
+    configure_logging(str(tmp_path / "analyzer.log"), profile="production")
+
+    logger_module.write_directly_after_fork()
+
+    assert isinstance(logging.getLogger().handlers[0], logging.FileHandler)
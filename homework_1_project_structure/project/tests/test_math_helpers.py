@@ -1,7 +1,23 @@
-from typing import Dict, List, Union
+from array import array
+from typing import Dict, Iterable
 
 import pytest
-from src.app.math_helpers import count_percentile, count_time_statistics, count_total
+from src.app import math_helpers
+from src.app.math_helpers import (
+    RequestAccumulator,
+    count_percentile,
+    count_time_statistics,
+    count_total,
+    create_times_factory,
+)
+from src.app.sketch_helpers import KLLSketch
+
+
+def make_request(times: Iterable[float], container=None) -> RequestAccumulator:
+    request = RequestAccumulator(array("d") if container is None else container)
+    for request_time in times:
+        request.add(request_time)
+    return request
 
 
 def test_count_percentile_valid() -> None:
@@ -19,59 +35,64 @@ def test_count_percentile_zero_total_count() -> None:
         count_percentile(50, 0)
 
 
-def test_count_total_single_values() -> None:
+def test_request_accumulator_add() -> None:
+    request = make_request([1.0, 3.0, 2.0])
+    assert request.count == 3
+    assert request.time_sum == 6.0
+    assert request.time_max == 3.0
+    assert request.times == array("d", [1.0, 3.0, 2.0])
+
+
+def test_request_accumulator_merge() -> None:
+    request = make_request([1.0, 3.0])
+    request.merge(make_request([5.0]))
+    assert request.count == 3
+    assert request.time_sum == 9.0
+    assert request.time_max == 5.0
+    assert request.times == array("d", [1.0, 3.0, 5.0])
+
+
+def test_count_total_counts() -> None:
     requests_data = {
-        "request1": {"key": 10},
-        "request2": {"key": 20},
-        "request3": {"key": 30},
+        "request1": make_request([1.0] * 10),
+        "request2": make_request([1.0] * 20),
+        "request3": make_request([1.0] * 30),
     }
-    result = count_total(requests_data, "key")
+    result = count_total(requests_data, "count")
     assert result == 60
 
 
-def test_count_total_list_values() -> None:
+def test_count_total_time_sums() -> None:
     requests_data = {
-        "request1": {"key": [10, 20]},
-        "request2": {"key": [30, 40]},
-        "request3": {"key": [50]},
+        "request1": make_request([10, 20]),
+        "request2": make_request([30, 40]),
+        "request3": make_request([50]),
     }
-    result = count_total(requests_data, "key")
+    result = count_total(requests_data, "time_sum")
     assert result == 150
 
 
-def test_count_total_mixed_values() -> None:
-    requests_data: Dict[str, Dict[str, Union[int, List[int]]]] = {
-        "request1": {"key": 10},
-        "request2": {"key": [20, 30]},
-        "request3": {"key": 40},
-    }
-    result = count_total(requests_data, "key")
-    assert result == 100
-
-
 def test_count_total_empty_dict() -> None:
     requests_data: Dict = {}
-    result = count_total(requests_data, "key")
+    result = count_total(requests_data, "count")
     assert result == 0
 
 
 def test_count_time_statistics_valid() -> None:
-    request_time_array: Dict[str, Dict[str, List[float]]] = {
-        "url1": {"times": [1.0, 2.0, 3.0]},
-        "url2": {"times": [4.0, 5.0, 6.0]},
+    requests_data = {
+        "url1": make_request([1.0, 2.0, 3.0]),
+        "url2": make_request([4.0, 5.0, 6.0]),
     }
     expected_result = {
         "url1": {"sum": 6.0, "avg": 2.0, "max": 3.0, "med": 2.0},
         "url2": {"sum": 15.0, "avg": 5.0, "max": 6.0, "med": 5.0},
     }
-    result = count_time_statistics(request_time_array)
+    result = count_time_statistics(requests_data)
     assert result == expected_result
 
 
 def test_count_time_statistics_single_url() -> None:
-    request_time_array: Dict[str, Dict[str, List[float]]] = {
-        "url1": {"times": [1.0, 2.0, 3.0]}
-    }
+    requests_data = {"url1": make_request([1.0, 2.0, 3.0])}
     expected_result = {
         "url1": {
             "sum": 6.0,
@@ -80,11 +101,49 @@ def test_count_time_statistics_single_url() -> None:
             "med": 2.0,
         }
     }
-    result = count_time_statistics(request_time_array)
+    result = count_time_statistics(requests_data)
     assert result == expected_result
 
 
 def test_count_time_statistics_empty_dict() -> None:
-    request_time_array: Dict = {}
-    result = count_time_statistics(request_time_array)
+    requests_data: Dict = {}
+    result = count_time_statistics(requests_data)
     assert result == {}
+
+
+def test_count_time_statistics_with_percentiles() -> None:
+    requests_data = {"url1": make_request(float(value) for value in range(1, 101))}
+    result = count_time_statistics(requests_data, percentiles=(90, 99))
+    assert result["url1"]["p90"] == 90.0
+    assert result["url1"]["p99"] == 99.0
+    assert result["url1"]["med"] == 50.5
+
+
+def test_count_time_statistics_with_sketch() -> None:
+    requests_data = {"url1": make_request([1.0, 2.0, 3.0], KLLSketch(k=200))}
+    result = count_time_statistics(requests_data)
+    assert result == {"url1": {"sum": 6.0, "avg": 2.0, "max": 3.0, "med": 2.0}}
+
+
+def test_create_times_factory() -> None:
+    assert create_times_factory("exact")() == array("d")
+    sketch = create_times_factory("approximate", sketch_error=0.1)()
+    assert isinstance(sketch, KLLSketch)
+    assert sketch.k == 17
+    with pytest.raises(ValueError):
+        create_times_factory("unknown")
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_count_time_statistics_timings_buffer(vectorized: bool, monkeypatch) -> None:
+    if not vectorized:
+        monkeypatch.setattr(math_helpers, "numpy", None)
+    requests_data = {
+        "url1": make_request([4.0, 1.0, 3.0, 2.0]),
+        "url2": make_request(float(value) for value in range(100, 0, -1)),
+    }
+    result = count_time_statistics(requests_data, percentiles=(90,))
+    assert result == {
+        "url1": {"sum": 10.0, "avg": 2.5, "max": 4.0, "med": 2.5, "p90": 4.0},
+        "url2": {"sum": 5050.0, "avg": 50.5, "max": 100.0, "med": 50.5, "p90": 90.0},
+    }
@@ -0,0 +1,84 @@
+from pathlib import Path
+
+from src.app.parallel_helpers import (
+    collect_request_data_parallel,
+    read_log_file_shard,
+    split_log_file,
+)
+from src.app.regex_helpers import generate_bytes_search_pattern
+from src.app.report_helpers import build_reports, generate_reports
+
+SEARCH_PATTERN = generate_bytes_search_pattern()
+
+
+def write_log_file(tmp_path: Path, lines_count: int) -> Path:
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    lines = [
+        "127.0.0.1 - - [10/Oct/2023:13:55:36 +0000] "
+        f'"GET /url{index % 7} HTTP/1.1" 200 1234 "-" "curl/7.64.1" '
+        f"{index % 13}.{index % 1000:03d}\n"
+        for index in range(lines_count)
+    ]
+    lines.insert(5, "Invalid log line format\n")
+    log_path.write_text("".join(lines), encoding="utf-8")
+    return log_path
+
+
+def test_split_log_file_aligns_to_line_boundaries(tmp_path: Path) -> None:
+    log_path = write_log_file(tmp_path, 100)
+    content = log_path.read_bytes()
+    shards = split_log_file(str(log_path), 4)
+
+    assert shards[0][0] == 0
+    assert shards[-1][1] == len(content)
+    for (_, end), (start, _) in zip(shards, shards[1:]):
+        assert end == start
+        assert content[:start].endswith(b"\n")
+
+
+def test_split_log_file_more_shards_than_lines(tmp_path: Path) -> None:
+    log_path = write_log_file(tmp_path, 1)
+    shards = split_log_file(str(log_path), 16)
+
+    lines = [
+        line
+        for start, end in shards
+        for line in read_log_file_shard(str(log_path), start, end)
+    ]
+    assert lines == log_path.read_bytes().splitlines(keepends=True)
+
+
+def test_collect_request_data_parallel_matches_serial(tmp_path: Path) -> None:
+    log_path = write_log_file(tmp_path, 500)
+    with open(log_path, "rb") as log_file:
+        serial_reports = generate_reports(log_file, SEARCH_PATTERN)
+
+    parallel_reports = build_reports(
+        collect_request_data_parallel(str(log_path), SEARCH_PATTERN, 3)
+    )
+
+    assert parallel_reports == serial_reports
+
+
+def test_collect_request_data_parallel_matches_serial_on_large_input(
+    tmp_path: Path,
+) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    log_path.write_text(
+        "".join(
+            "127.0.0.1 - - [10/Oct/2023:13:55:36 +0000] "
+            f'"GET /url{index * 7919 % 7} HTTP/1.1" 200 1234 "-" "curl/7.64.1" '
+            f"{index * 104729 % 9973 / 1000:.3f}\n"
+            for index in range(60_000)
+        ),
+        encoding="utf-8",
+    )
+    with open(log_path, "rb") as log_file:
+        serial_reports = generate_reports(log_file, SEARCH_PATTERN, report_size=50)
+
+    parallel_reports = build_reports(
+        collect_request_data_parallel(str(log_path), SEARCH_PATTERN, 7),
+        report_size=50,
+    )
+
+    assert parallel_reports == serial_reports
@@ -0,0 +1,49 @@
+import pstats
+import tracemalloc
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from src.app import profiling_helpers
+from src.app.profiling_helpers import enable_timing_spans, run_profiled, timing_span
+
+
+@pytest.fixture
+def timing_spans():
+    enable_timing_spans()
+    yield
+    enable_timing_spans(False)
+
+
+@patch("src.app.profiling_helpers.logger")
+def test_timing_span_logs_items_per_second(mock_logger: MagicMock, timing_spans) -> None:
+    with timing_span("collect_request_data") as span:
+        span.items = 100
+
+    _, kwargs = mock_logger.info.call_args
+    assert kwargs["stage"] == "collect_request_data"
+    assert kwargs["items"] == 100
+    assert kwargs["elapsed"] >= 0
+    assert span.elapsed > 0
+
+
+@patch("src.app.profiling_helpers.logger")
+def test_timing_span_is_silent_when_disabled(mock_logger: MagicMock) -> None:
+    assert not profiling_helpers.timing_spans_enabled
+    with timing_span("render", items=1):
+        pass
+    mock_logger.info.assert_not_called()
+
+
+def test_run_profiled_dumps_profile_and_snapshot(tmp_path: Path) -> None:
+    profile_path = tmp_path / "profile"
+    tracemalloc_path = tmp_path / "snapshot"
+
+    result = run_profiled(
+        lambda: sum(range(1000)), str(profile_path), str(tracemalloc_path)
+    )
+
+    assert result == 499500
+    assert pstats.Stats(str(profile_path)).get_stats_profile().func_profiles
+    assert tracemalloc.Snapshot.load(str(tracemalloc_path)).traces is not None
+    assert not tracemalloc.is_tracing()
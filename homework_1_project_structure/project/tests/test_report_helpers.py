@@ -1,20 +1,43 @@
+import json
+import os
 import re
-from typing import List, Tuple
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Tuple
 
 import pytest
+from src.app.math_helpers import RequestAccumulator, create_times_factory
+from src.app.regex_helpers import generate_bytes_search_pattern
 from src.app.report_helpers import (
+    OTHER_URL,
+    build_reports,
+    cap_request_data,
     collect_request_data,
     generate_percentiles_report,
+    generate_period_key,
+    generate_period_report_path,
     generate_report_data,
     generate_report_file_name,
+    generate_report_path,
     generate_reports,
+    is_report_up_to_date,
+    merge_request_data,
+    write_report_file,
 )
+from src.app.url_helpers import UrlNormalizer
+
+
+def make_request(times: Iterable[float]) -> RequestAccumulator:
+    request = RequestAccumulator(array("d"))
+    for request_time in times:
+        request.add(request_time)
+    return request
 
 
 def test_generate_percentiles_report_valid() -> None:
     requests_data = {
-        "url1": {"count": 10, "times": [1.0, 2.0, 3.0]},
-        "url2": {"count": 5, "times": [4.0, 5.0]},
+        "url1": make_request([1.0] * 10),
+        "url2": make_request([4.0] * 5),
     }
     total_count = 15
     result = generate_percentiles_report(
@@ -28,25 +51,25 @@ def test_generate_percentiles_report_valid() -> None:
     }
 
 
-def test_generate_percentiles_report_with_lists() -> None:
+def test_generate_percentiles_report_time_sum() -> None:
     requests_data = {
-        "url1": {"count": [5, 5], "times": [1.0, 2.0, 3.0]},
-        "url2": {"count": [3, 2], "times": [4.0, 5.0]},
+        "url1": make_request([1.0, 2.0, 3.0]),
+        "url2": make_request([4.0, 5.0]),
     }
-    total_count = 15
+    total_time = 15.0
     result = generate_percentiles_report(
         requests_data,
-        "count",
-        total_count,
+        "time_sum",
+        total_time,
     )
     assert result == {
-        "url1": 66.66666666666666,
-        "url2": 33.33333333333333,
+        "url1": 40.0,
+        "url2": 60.0,
     }
 
 
 def test_generate_percentiles_report_zero_total_count() -> None:
-    requests_data = {"url1": {"count": 10}}
+    requests_data = {"url1": make_request([1.0] * 10)}
     total_count = 0
     with pytest.raises(ZeroDivisionError):
         generate_percentiles_report(requests_data, "count", total_count)
@@ -60,8 +83,8 @@ def test_collect_request_data_valid() -> None:
     ]
     result = collect_request_data(log_data)
     expected_result = {
-        "url1": {"count": 2, "times": [1.0, 3.0]},
-        "url2": {"count": 1, "times": [2.0]},
+        "url1": RequestAccumulator(array("d", [1.0, 3.0]), 2, 4.0, 3.0),
+        "url2": RequestAccumulator(array("d", [2.0]), 1, 2.0, 2.0),
     }
     assert result == expected_result
 
@@ -72,14 +95,25 @@ def test_collect_request_data_empty_log_data() -> None:
     assert result == {}
 
 
+def test_merge_request_data_keeps_first_seen_order() -> None:
+    result = merge_request_data(
+        [
+            collect_request_data([("url1", "1.0"), ("url2", "2.0")]),
+            collect_request_data([("url3", "3.0"), ("url1", "4.0")]),
+        ]
+    )
+    assert list(result) == ["url1", "url2", "url3"]
+    assert result["url1"] == RequestAccumulator(array("d", [1.0, 4.0]), 2, 5.0, 4.0)
+
+
 def test_generate_report_data_valid() -> None:
     time_stats = {
         "url1": {"sum": 4.0, "avg": 2.0, "max": 3.0, "med": 2.0},
         "url2": {"sum": 9.0, "avg": 4.5, "max": 5.0, "med": 5.0},
     }
     requests_data = {
-        "url1": {"count": 2, "times": [1.0, 3.0]},
-        "url2": {"count": 1, "times": [4.0, 5.0]},
+        "url1": make_request([1.0, 3.0]),
+        "url2": make_request([9.0]),
     }
     time_percentiles = {"url1": 40.0, "url2": 60.0}
     count_percentiles = {"url1": 66.67, "url2": 33.33}
@@ -111,6 +145,18 @@ def test_generate_report_data_valid() -> None:
     assert result == expected_result
 
 
+def test_build_reports_count_and_time_percentages() -> None:
+    requests_data = {
+        "url1": make_request([1.0, 1.0, 1.0]),
+        "url2": make_request([7.0]),
+    }
+    result = build_reports(requests_data)
+    assert result[0]["count_perc"] == 75.0
+    assert result[0]["time_perc"] == 30.0
+    assert result[1]["count_perc"] == 25.0
+    assert result[1]["time_perc"] == 70.0
+
+
 def test_generate_report_file_name_valid() -> None:
     file_date = "20231010"
     result = generate_report_file_name(file_date)
@@ -142,3 +188,201 @@ def test_generate_reports_valid(mocker) -> None:
     assert len(result) == 2
     assert result[0]["url"] == "/url1"
     assert result[1]["url"] == "/url2"
+
+
+def test_generate_reports_consumes_lines_lazily() -> None:
+    consumed: List[str] = []
+
+    def log_lines():
+        for url, request_time in (("/url1", "1.0"), ("/url2", "2.0"), ("/url1", "3.0")):
+            line = (
+                "127.0.0.1 - - [10/Oct/2023:13:55:36 +0000] "
+                f'"GET {url} HTTP/1.1" 200 1234 "-" "curl/7.64.1" {request_time}\n'
+            )
+            consumed.append(line)
+            yield line
+
+    search_pattern = re.compile(r"\"([A-Z]+) (/[^\s]+) HTTP/1\.[01]\"\s.*\s(\d+\.\d+)$")
+    result = generate_reports(log_lines(), search_pattern)
+    assert len(consumed) == 3
+    assert [report["url"] for report in result] == ["/url1", "/url2"]
+    assert result[0]["count"] == 2
+    assert result[0]["time_sum"] == 4.0
+
+
+def test_generate_reports_approximate_percentiles() -> None:
+    log_lines = [
+        f'"GET /url{index % 2} HTTP/1.1" 200 {index % 100}.0\n'.encode()
+        for index in range(10_000)
+    ]
+    result = generate_reports(
+        log_lines,
+        generate_bytes_search_pattern(),
+        new_times=create_times_factory("approximate", sketch_error=0.01),
+        percentiles=(90, 99),
+    )
+    assert [report["count"] for report in result] == [5000, 5000]
+    assert result[0]["time_sum"] == sum(float(index) for index in range(0, 100, 2)) * 100
+    assert abs(result[0]["time_p90"] - 88.0) <= 2.0
+    assert abs(result[0]["time_p99"] - 98.0) <= 2.0
+
+
+def test_build_reports_truncates_to_report_size() -> None:
+    requests_data = {
+        f"url{index}": make_request([float(index)] * (index % 3 + 1))
+        for index in range(10)
+    }
+    result = build_reports(requests_data, report_size=3)
+    assert [report["url"] for report in result] == ["url8", "url5", "url7"]
+    assert [report["time_sum"] for report in result] == [24.0, 15.0, 14.0]
+    assert result[0]["time_perc"] == float(f"{24.0 / 87.0 * 100:.10f}")
+    assert result[0]["count_perc"] == float(f"{3 / 19 * 100:.10f}")
+
+
+def test_build_reports_breaks_time_sum_ties_by_url() -> None:
+    urls = ["/d", "/b", "/c", "/a", "/e"]
+    requests_data = {url: make_request([1.0]) for url in urls}
+    reordered_requests_data = {url: make_request([1.0]) for url in reversed(urls)}
+
+    result = build_reports(requests_data, report_size=3)
+
+    assert [report["url"] for report in result] == ["/a", "/b", "/c"]
+    assert build_reports(reordered_requests_data, report_size=3) == result
+
+
+def test_build_reports_report_size_larger_than_urls() -> None:
+    requests_data = {"url1": make_request([1.0]), "url2": make_request([2.0])}
+    result = build_reports(requests_data, report_size=1000)
+    assert [report["url"] for report in result] == ["url1", "url2"]
+
+
+def test_generate_report_path() -> None:
+    result = generate_report_path({"REPORT_DIR": "/reports"}, "20231010")
+    assert result == "/reports/report-2023.10.10.html"
+
+
+def test_is_report_up_to_date(tmp_path: Path) -> None:
+    log_path = tmp_path / "nginx-access-ui.log-20231010"
+    report_path = tmp_path / "report-2023.10.10.html"
+    log_path.touch()
+    assert not is_report_up_to_date(str(report_path), str(log_path))
+
+    report_path.touch()
+    os.utime(log_path, ns=(0, 1_000_000_000))
+    os.utime(report_path, ns=(0, 2_000_000_000))
+    assert is_report_up_to_date(str(report_path), str(log_path))
+
+    os.utime(log_path, ns=(0, 3_000_000_000))
+    assert not is_report_up_to_date(str(report_path), str(log_path))
+
+
+def test_generate_period_key() -> None:
+    assert generate_period_key("20231010", "week") == "2023-W41"
+    assert generate_period_key("20240101", "week") == "2024-W01"
+    assert generate_period_key("20231010", "month") == "2023.10"
+    with pytest.raises(ValueError):
+        generate_period_key("20231010", "year")
+
+
+def test_generate_period_report_path() -> None:
+    result = generate_period_report_path({"REPORT_DIR": "/reports"}, "2023-W41")
+    assert result == "/reports/report-2023-W41.html"
+
+
+@pytest.mark.parametrize("reports_count", [0, 1, 2500])
+def test_write_report_file_streams_rows(tmp_path: Path, reports_count: int) -> None:
+    template_path = tmp_path / "report.html"
+    template_path.write_text("<script>var table = $table_json;</script>\n")
+    output_path = tmp_path / "report-2023.10.10.html"
+    reports = [{"url": f"/ü/{index}", "count": index} for index in range(reports_count)]
+
+    write_report_file(iter(reports), str(template_path), str(output_path))
+
+    report_html = output_path.read_text(encoding="utf-8")
+    table_json = report_html.split("var table = ", 1)[1].split(";</script>", 1)[0]
+    assert json.loads(table_json) == reports
+    assert report_html.endswith(";</script>\n")
+    assert sorted(os.listdir(tmp_path)) == [output_path.name, template_path.name]
+
+
+def test_write_report_file_keeps_old_report_on_failure(tmp_path: Path, mocker) -> None:
+    template_path = tmp_path / "report.html"
+    template_path.write_text("var table = $table_json;")
+    output_path = tmp_path / "report-2023.10.10.html"
+    output_path.write_text("old report")
+
+    mocker.patch("os.replace", side_effect=OSError)
+    with pytest.raises(OSError):
+        write_report_file([{"url": "/"}], str(template_path), str(output_path))
+
+    assert output_path.read_text() == "old report"
+    assert sorted(os.listdir(tmp_path)) == [output_path.name, template_path.name]
+
+
+def test_write_report_file_removes_temporary_file_when_rendering_fails(
+    tmp_path: Path,
+) -> None:
+    template_path = tmp_path / "report.html"
+    template_path.write_text("var table = $table_json;")
+    output_path = tmp_path / "report-2023.10.10.html"
+
+    def failing_reports() -> Iterable[dict]:
+        yield {"url": "/"}
+        raise RuntimeError("rendering failed")
+
+    with pytest.raises(RuntimeError):
+        write_report_file(failing_reports(), str(template_path), str(output_path))
+
+    assert os.listdir(tmp_path) == [template_path.name]
+
+
+def test_cap_request_data_folds_rare_urls_into_other() -> None:
+    requests_data = {
+        f"/url{index}": make_request([1.0] * (index + 1)) for index in range(10)
+    }
+
+    cap_request_data(requests_data, 4)
+
+    assert list(requests_data) == ["/url7", "/url8", "/url9", OTHER_URL]
+    assert requests_data[OTHER_URL].count == sum(range(1, 8))
+    assert len(requests_data[OTHER_URL].times) == sum(range(1, 8))
+
+
+def test_collect_request_data_keeps_late_heavy_hitter() -> None:
+    log_data = [(f"/a{index}", "1.0") for _ in range(10_000) for index in range(10)]
+    for index in range(60_000):
+        log_data += [("/late", "1.0"), (f"/tail{index}", "1.0")]
+
+    result = collect_request_data(log_data, max_urls=11)
+
+    assert len(result) == 11
+    assert "/late" in result
+    assert result["/late"].eviction_priority >= 60_000
+    assert sum(request.count for request in result.values()) == len(log_data)
+
+
+def test_merge_request_data_carries_evicted_floors() -> None:
+    first = {f"/url{index}": make_request([1.0] * (index + 1)) for index in range(6)}
+    second = {"/url5": make_request([1.0] * 10), "/new": make_request([1.0])}
+    cap_request_data(first, 3)
+
+    result = merge_request_data([first, second])
+
+    assert result[OTHER_URL].count_error == 4
+    assert result["/new"].count_error == 4
+    assert result["/url5"].count_error == 0
+    assert result["/url5"].count == 16
+
+
+def test_collect_request_data_caps_urls_with_normalization() -> None:
+    log_data = [(f"/banner/{index}?page={index}", "1.0") for index in range(50)]
+    log_data += [(f"/rare{index}", "2.0") for index in range(50)]
+    log_data += [("/hot", "3.0")] * 20
+
+    result = collect_request_data(log_data, normalize_url=UrlNormalizer(), max_urls=3)
+
+    assert set(result) == {"/banner/{id}", "/hot", OTHER_URL}
+    assert result["/banner/{id}"].count == 50
+    assert result["/hot"].count == 20
+    assert result[OTHER_URL].count == 50
+    assert result[OTHER_URL].time_sum == 100.0
@@ -0,0 +1,54 @@
+import random
+from statistics import median
+
+from src.app.sketch_helpers import KLLSketch, sketch_k_for_error
+
+
+def rank_error(values: list, value: float, fraction: float) -> float:
+    rank = sum(1 for item in values if item <= value)
+    return abs(rank / len(values) - fraction)
+
+
+def test_sketch_k_for_error() -> None:
+    assert sketch_k_for_error(0.01) == 165
+    assert sketch_k_for_error(10.0) == 8
+
+
+def test_kll_sketch_small_input_is_exact() -> None:
+    sketch = KLLSketch(k=200)
+    values = [3.0, 1.0, 4.0, 1.5, 9.0, 2.6]
+    sketch.extend(values)
+
+    assert sketch.is_exact()
+    assert sketch.median() == median(values)
+    assert sketch.quantile(1.0) == 9.0
+    assert len(sketch) == 6
+
+
+def test_kll_sketch_large_input_within_error_bound() -> None:
+    generator = random.Random(42)
+    values = [generator.expovariate(2.0) for _ in range(100_000)]
+    sketch = KLLSketch(k=sketch_k_for_error(0.01))
+    sketch.extend(values)
+
+    assert not sketch.is_exact()
+    assert sketch.retained < 3 * sketch.k + 10 * len(sketch.compactors)
+    for fraction in (0.5, 0.9, 0.95, 0.99):
+        assert rank_error(values, sketch.quantile(fraction), fraction) < 0.01
+    assert len(sketch) == len(values)
+
+
+def test_kll_sketch_merge_within_error_bound() -> None:
+    generator = random.Random(7)
+    values = [generator.random() for _ in range(60_000)]
+    sketches = [KLLSketch(k=165) for _ in range(3)]
+    for index, value in enumerate(values):
+        sketches[index % 3].append(value)
+
+    merged = KLLSketch(k=165)
+    for sketch in sketches:
+        merged.extend(sketch)
+
+    assert len(merged) == len(values)
+    assert merged.retained < merged.capacity
+    assert rank_error(values, merged.median(), 0.5) < 0.01
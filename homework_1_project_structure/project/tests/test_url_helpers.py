@@ -0,0 +1,46 @@
+import pickle
+
+from src.app.url_helpers import (
+    UrlNormalizer,
+    create_url_normalizer,
+    normalize_log_data,
+)
+
+
+def test_url_normalizer_strips_query_and_collapses_ids() -> None:
+    normalize_url = UrlNormalizer()
+
+    assert normalize_url("/api/v2/banner/25019354") == "/api/v2/banner/{id}"
+    assert normalize_url("/api/1/slot/4705/groups?id=7") == "/api/{id}/slot/{id}/groups"
+    assert normalize_url("/export/3fa85f64-5717-4562-b3fc-2c963f66afa6/report.csv") == (
+        "/export/{uuid}/report.csv"
+    )
+    assert (
+        normalize_url("/api/v2/internal/html5/phone") == "/api/v2/internal/html5/phone"
+    )
+
+
+def test_url_normalizer_options() -> None:
+    assert UrlNormalizer(collapse_ids=False)("/banner/25?x=1") == "/banner/25"
+    assert UrlNormalizer(strip_query=False)("/banner/25?x=1") == "/banner/{id}?x=1"
+
+
+def test_url_normalizer_is_picklable() -> None:
+    normalize_url = UrlNormalizer()
+    normalize_url("/banner/25")
+    assert pickle.loads(pickle.dumps(normalize_url))("/banner/26") == "/banner/{id}"
+
+
+def test_create_url_normalizer() -> None:
+    assert create_url_normalizer({}) is None
+    assert create_url_normalizer({"URL_STRIP_QUERY": True}) == UrlNormalizer(
+        strip_query=True, collapse_ids=False
+    )
+
+
+def test_normalize_log_data_skips_unparsed_lines() -> None:
+    log_data = [("/banner/1?a=b", b"0.1"), None, ("/banner/2", b"0.2")]
+    assert list(normalize_log_data(log_data, UrlNormalizer())) == [
+        ("/banner/{id}", b"0.1"),
+        ("/banner/{id}", b"0.2"),
+    ]
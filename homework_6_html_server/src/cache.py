@@ -0,0 +1,158 @@
+import os
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from httpd import Response, TCPServer
+
+
+@dataclass
+class CachedResponse:
+    """One file body with prebuilt keep-alive and close headers for it, its
+    validators and matching 304 responses."""
+    file_path: str
+    inode: int
+    mtime_ns: int
+    size: int
+    mtime: float
+    etag: str
+    last_modified: str
+    body: bytes
+    headers: dict[bool, bytes]
+    not_modified_payloads: dict[bool, bytes]
+    checked: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def build(
+        cls,
+        body: bytes,
+        file_path: str,
+        file_stat: os.stat_result,
+        status_code: int,
+        content_type: str,
+        status_message: str,
+        validators: bool = True,
+    ):
+        etag = TCPServer.build_etag(file_stat)
+        last_modified = TCPServer.format_http_date(file_stat.st_mtime)
+        headers = {}
+        not_modified_payloads = {}
+        for keep_alive in (True, False):
+            headers[keep_alive] = TCPServer.build_headers(
+                status_code,
+                len(body),
+                content_type,
+                status_message,
+                keep_alive,
+                etag if validators else None,
+                last_modified if validators else None,
+            )
+            not_modified_payloads[keep_alive] = TCPServer.build_not_modified(
+                etag, last_modified, keep_alive
+            )
+        return cls(
+            file_path,
+            file_stat.st_ino,
+            file_stat.st_mtime_ns,
+            file_stat.st_size,
+            file_stat.st_mtime,
+            etag,
+            last_modified,
+            body,
+            headers,
+            not_modified_payloads,
+        )
+
+    @property
+    def memory_size(self):
+        return len(self.body) + sum(
+            len(payload)
+            for payloads in (self.headers, self.not_modified_payloads)
+            for payload in payloads.values()
+        )
+
+    def matches(self, file_stat: os.stat_result):
+        return (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size) == (
+            self.inode, self.mtime_ns, self.size
+        )
+
+    def response(
+        self,
+        keep_alive: bool = True,
+        head: bool = False,
+        request_headers: Optional[dict[str, str]] = None,
+    ):
+        """Pick the prebuilt headers for the request, answering 304 when the
+        client's validators still match."""
+        if request_headers and TCPServer.is_not_modified(
+            request_headers, self.etag, self.mtime
+        ):
+            return Response(self.not_modified_payloads[keep_alive])
+        headers = self.headers[keep_alive]
+        if head:
+            return Response(headers)
+        return Response(headers, self.body)
+
+
+class StaticFileCache:
+    """LRU cache of prebuilt responses, bounded by their total size in bytes.
+
+    Entries are keyed by normalized request path and status code, so a hit
+    needs no path resolution. An entry is checked against the inode, mtime
+    and size of its file at most once per ``revalidate_interval`` seconds and
+    dropped when the file changed.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_file_size: int,
+        revalidate_interval: float = 1.0,
+    ):
+        self.max_size = max_size
+        self.max_file_size = min(max_file_size, max_size)
+        self.revalidate_interval = revalidate_interval
+        self.entries: OrderedDict[tuple[str, int], CachedResponse] = OrderedDict()
+        self.size = 0
+
+    def fits(self, content_length: int):
+        return content_length <= self.max_file_size
+
+    def get(self, request_path: str, status_code: int) -> Optional[CachedResponse]:
+        key = (request_path, status_code)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if now - entry.checked >= self.revalidate_interval:
+            try:
+                file_stat = os.stat(entry.file_path)
+            except OSError:
+                self.pop(key)
+                return None
+            if not entry.matches(file_stat):
+                self.pop(key)
+                return None
+            entry.checked = now
+
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, request_path: str, status_code: int, entry: CachedResponse):
+        key = (request_path, status_code)
+        self.pop(key)
+        if entry.memory_size > self.max_size:
+            return
+        while self.size + entry.memory_size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.memory_size
+        self.entries[key] = entry
+        self.size += entry.memory_size
+
+    def pop(self, key: tuple[str, int]):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.memory_size
@@ -1,8 +1,15 @@
+import asyncio
+import contextlib
+import email.utils
+import signal
 import socket
 import os
+import time
 
 from abc import ABC
-from collections.abc import Buffer
+from collections.abc import Buffer, Callable
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
 
 from logger import logger
 
@@ -36,6 +43,41 @@ class BaseClient(ABC):
         raise NotImplementedError
 
 
+class RequestTooLarge(ValueError):
+    """A request announces a body above ``TCPServer.MAX_BODY_SIZE``."""
+
+
+@dataclass
+class Response:
+    """Headers, or a whole small response, to send first, plus the body as an
+    in-memory buffer sent in the same call or as an open file sent after.
+
+    Exactly ``file_size`` bytes of ``file``, the Content-Length announced in
+    the headers, are sent, so a file that grows meanwhile cannot break the
+    framing of the next response on the connection.
+    """
+    payload: Buffer
+    body: Optional[Buffer] = None
+    file: Optional[BinaryIO] = None
+    file_size: int = 0
+
+    @property
+    def buffers(self):
+        if self.body is None:
+            return [self.payload]
+        return [self.payload, self.body]
+
+    def check_file_sent(self, sent: int):
+        if sent < self.file_size:
+            raise ValueError(
+                f'File body ended after {sent} of {self.file_size} bytes'
+            )
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
 class TCPServer(BaseServer):
     CONTENT_TYPE = {
         '.html': 'text/html',
@@ -46,23 +88,39 @@ class TCPServer(BaseServer):
         '.png': 'image/png',
         '.gif': 'image/gif',
     }
+    REQUEST_TERMINATOR = b'\r\n\r\n'
+    MAX_SEND_BUFFERS = 1024
+    MAX_HEADERS_SIZE = 8192
+    MAX_BODY_SIZE = 64 * 1024
+    RECV_SIZE = 65536
 
     def __init__(
         self,
         host: str,
         port: int,
-        number_of_clients: int = None
+        number_of_clients: int = None,
+        reuse_port: bool = False,
+        idle_timeout: float = 5.0,
+        max_requests: int = 100,
     ):
         self.host = host
         self.port = port
         self.number_of_clients = number_of_clients
+        self.reuse_port = reuse_port
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
         self.server_socket = self.initiate_server_socket()
         self.connection = None
+        self.buffer = bytearray()
+        self.requests_served = 0
 
     def initiate_server_socket(
         self
     ):
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         server_socket.bind((self.host, self.port))
         server_socket.listen(self.number_of_clients)
         return server_socket
@@ -79,42 +137,460 @@ class TCPServer(BaseServer):
         return self.server_socket.accept()
 
     def serve(self):
-        self.connection, address = self.accept()
-        logger.info(f'Connected by {address}')
-        data = self.connection.recv(1024).decode('utf-8')
+        """Return the next request, from the open connection or a new one.
 
-        if not data:
-            self.connection.close()
-            logger.info("Connection closed (no data)")
+        A connection is dropped when the client closes it, stays idle for
+        ``idle_timeout`` seconds or sends a malformed request.
+        """
+        while True:
+            if self.connection is None:
+                self.connection, address = self.accept()
+                self.connection.settimeout(self.idle_timeout)
+                self.buffer = bytearray()
+                self.requests_served = 0
+                logger.info(f'Connected by {address}')
+
+            try:
+                request = self.split_request(self.buffer)
+                if request is not None:
+                    self.requests_served += 1
+                    return request
+                chunk = self.connection.recv(self.RECV_SIZE)
+            except RequestTooLarge as err:
+                logger.error(err)
+                try:
+                    self.send(self.build_too_large())
+                except OSError:
+                    pass
+                chunk = b''
+            except (ValueError, OSError) as err:
+                logger.error(err)
+                chunk = b''
+
+            if not chunk:
+                logger.info("Connection closed")
+                self.close_connection()
+                continue
+            self.buffer += chunk
+
+    def has_buffered_request(self):
+        """Whether the client already sent (part of) another request."""
+        return bool(self.buffer)
+
+    def keep_alive(self, request: str, requests_served: Optional[int] = None):
+        if requests_served is None:
+            requests_served = self.requests_served
+        return (
+            requests_served < self.max_requests
+            and self.client_keeps_alive(request)
+        )
+
+    @staticmethod
+    def parse_headers(request: str):
+        """Return the request headers keyed by lowercased name."""
+        headers = {}
+        for header in request.split('\r\n')[1:]:
+            name, separator, value = header.partition(':')
+            if separator:
+                headers[name.strip().lower()] = value.strip()
+        return headers
+
+    @classmethod
+    def client_keeps_alive(cls, request: str):
+        connection = cls.parse_headers(request).get('connection', '').lower()
+        if request.partition('\r\n')[0].endswith('HTTP/1.0'):
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    @classmethod
+    def split_request(cls, buffer: bytearray):
+        """Cut the first complete request off ``buffer`` and return its head.
+
+        A request body announced by Content-Length is consumed and dropped,
+        since only GET and HEAD are served; a body over ``MAX_BODY_SIZE``
+        raises RequestTooLarge as soon as the headers arrive. Returns None
+        until the request has fully arrived.
+        """
+        headers_end = buffer.find(cls.REQUEST_TERMINATOR)
+        if headers_end == -1:
+            if len(buffer) > cls.MAX_HEADERS_SIZE:
+                raise ValueError('Request headers are too large')
+            return None
+
+        request = bytes(buffer[:headers_end]).decode('utf-8', 'replace')
+        content_length = 0
+        for header in request.split('\r\n')[1:]:
+            name, _, value = header.partition(':')
+            if name.strip().lower() == 'content-length':
+                if not value.strip().isdigit():
+                    raise ValueError(f'Invalid Content-Length: {value.strip()}')
+                content_length = int(value)
+                if content_length > cls.MAX_BODY_SIZE:
+                    raise RequestTooLarge(
+                        f'Request body of {content_length} bytes is too large'
+                    )
 
-        return data
+        request_end = headers_end + len(cls.REQUEST_TERMINATOR) + content_length
+        if len(buffer) < request_end:
+            return None
+        del buffer[:request_end]
+        return request + '\r\n\r\n'
 
     def send(self, response: Buffer):
         self.connection.sendall(response)
 
-    def get_content_type(self, file_path: str):
+    @staticmethod
+    def skip_sent(views: list[memoryview], sent: int):
+        """Drop the first ``sent`` bytes from the front of ``views``."""
+        while views and sent >= len(views[0]):
+            sent -= len(views.pop(0))
+        if sent:
+            views[0] = views[0][sent:]
+
+    @classmethod
+    def sendmsg_all(cls, connection: socket.socket, buffers: list[Buffer]):
+        """Write all ``buffers`` with one sendmsg call per partial write."""
+        views = [memoryview(buffer) for buffer in buffers if len(buffer)]
+        while views:
+            cls.skip_sent(views, connection.sendmsg(views[:cls.MAX_SEND_BUFFERS]))
+
+    def send_response(self, response: Response):
+        """Send the headers with any in-memory body in one call, then let the
+        kernel copy a file body to the socket."""
+        try:
+            self.sendmsg_all(self.connection, response.buffers)
+            if response.file:
+                response.check_file_sent(
+                    self.connection.sendfile(response.file, count=response.file_size)
+                )
+        finally:
+            response.close()
+
+    @classmethod
+    def get_content_type(cls, file_path: str):
         extension_name = os.path.splitext(file_path)[1].lower()
-        return self.CONTENT_TYPE.get(extension_name, 'application/octet-stream')
+        return cls.CONTENT_TYPE.get(extension_name, 'application/octet-stream')
+
+    @staticmethod
+    def build_etag(file_stat: os.stat_result):
+        return f'"{file_stat.st_ino:x}-{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"'
 
     @staticmethod
+    def format_http_date(timestamp: float):
+        return email.utils.formatdate(timestamp, usegmt=True)
+
+    @staticmethod
+    def is_not_modified(request_headers: dict[str, str], etag: str, mtime: float):
+        """Evaluate If-None-Match, or If-Modified-Since when it is absent.
+
+        ETags are compared weakly, and an unparsable date is ignored.
+        """
+        if_none_match = request_headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+
+        if_modified_since = request_headers.get('if-modified-since')
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since.timestamp()
+
+    @staticmethod
+    def build_headers(
+        status_code: int,
+        content_length: Optional[int],
+        content_type: Optional[str],
+        status_message: str,
+        keep_alive: bool = True,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        connection = 'keep-alive' if keep_alive else 'close'
+        headers = [f'HTTP/1.1 {status_code} {status_message}', 'Allow: GET, HEAD']
+        if content_type is not None:
+            headers.append(f'Content-Type: {content_type}')
+        if content_length is not None:
+            headers.append(f'Content-Length: {content_length}')
+        if etag is not None:
+            headers.append(f'ETag: {etag}')
+        if last_modified is not None:
+            headers.append(f'Last-Modified: {last_modified}')
+        headers.append(f'Connection: {connection}')
+        return bytes('\r\n'.join(headers) + '\r\n\r\n', encoding='utf-8')
+
+    @classmethod
+    def build_not_modified(
+        cls,
+        etag: str,
+        last_modified: str,
+        keep_alive: bool = True,
+    ):
+        return cls.build_headers(
+            304, None, None, 'Not Modified', keep_alive, etag, last_modified
+        )
+
+    @classmethod
+    def build_too_large(cls):
+        return cls.build_headers(413, 0, None, 'Payload Too Large', keep_alive=False)
+
+    @classmethod
     def build_response(
+        cls,
         message: str,
         status_code: int,
         content_length: int,
         content_type: str,
         status_message: str,
+        keep_alive: bool = True,
     ):
-        return bytes(
-            (
-                f'HTTP/1.1 {status_code} {status_message}\r\n'
-                f'Allow: GET, HEAD\r\n'
-                f'Content-Type: {content_type}\r\n'
-                f'Content-Length: {content_length}\r\n'
-                f'Connection: keep-alive\r\n\r\n'
-                f'{message}'
-            ),
-            encoding='utf-8'
+        return cls.build_headers(
+            status_code, content_length, content_type, status_message, keep_alive
+        ) + message.encode('utf-8')
+
+    @classmethod
+    def build_file_response(
+        cls,
+        file: BinaryIO,
+        status_code: int,
+        content_length: int,
+        content_type: str,
+        status_message: str,
+        keep_alive: bool = True,
+        head: bool = False,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """Build a response whose body is sent straight from ``file``.
+
+        For HEAD requests the file is closed right away and only the headers,
+        with the full Content-Length, are sent.
+        """
+        headers = cls.build_headers(
+            status_code,
+            content_length,
+            content_type,
+            status_message,
+            keep_alive,
+            etag,
+            last_modified,
         )
+        if head:
+            file.close()
+            return Response(headers)
+        return Response(headers, file=file, file_size=content_length)
+
+
+class AsyncTCPServer(TCPServer):
+    """Event-loop server that handles up to ``max_connections`` clients at once.
+
+    Accepting stops while the limit is reached, so excess clients wait in the
+    listen backlog instead of holding open sockets.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        number_of_clients: int = None,
+        max_connections: int = 1000,
+        reuse_port: bool = False,
+        idle_timeout: float = 5.0,
+        max_requests: int = 100,
+    ):
+        super().__init__(
+            host, port, number_of_clients, reuse_port, idle_timeout, max_requests
+        )
+        self.max_connections = max_connections
+
+    def initiate_server_socket(
+        self
+    ):
+        server_socket = super().initiate_server_socket()
+        server_socket.setblocking(False)
+        return server_socket
+
+    async def serve_forever(self, handle_request: Callable[[str, bool], Response]):
+        loop = asyncio.get_running_loop()
+        connections = asyncio.Semaphore(self.max_connections)
+        tasks = set()
+
+        while True:
+            await connections.acquire()
+            try:
+                connection, address = await loop.sock_accept(self.server_socket)
+            except BaseException:
+                connections.release()
+                raise
+            task = asyncio.create_task(
+                self.handle_connection(connection, address, handle_request)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: connections.release())
+
+    async def handle_connection(
+        self,
+        connection: socket.socket,
+        address,
+        handle_request: Callable[[str, bool], Response],
+    ):
+        """Serve requests off one connection until it closes or goes idle.
+
+        Pipelined requests are answered in order, with the buffers of every
+        response that is ready written in as few sends as file bodies allow.
+        """
+        loop = asyncio.get_running_loop()
+        logger.info(f'Connected by {address}')
+        buffer = bytearray()
+        requests_served = 0
+        try:
+            while True:
+                responses = []
+                keep_alive = True
+                while keep_alive:
+                    try:
+                        request = self.split_request(buffer)
+                    except RequestTooLarge as err:
+                        logger.error(err)
+                        responses.append(Response(self.build_too_large()))
+                        keep_alive = False
+                        break
+                    if request is None:
+                        break
+                    requests_served += 1
+                    keep_alive = self.keep_alive(request, requests_served)
+                    responses.append(handle_request(request, keep_alive=keep_alive))
+                if responses:
+                    await self.send_responses(connection, responses)
+                if not keep_alive:
+                    return
+
+                chunk = await asyncio.wait_for(
+                    loop.sock_recv(connection, self.RECV_SIZE), self.idle_timeout
+                )
+                if not chunk:
+                    logger.info("Connection closed")
+                    return
+                buffer += chunk
+        except TimeoutError:
+            logger.info(f'Connection idle for {self.idle_timeout}s, closing')
+        except (ValueError, OSError) as err:
+            logger.error(err)
+        finally:
+            connection.close()
+
+    @classmethod
+    async def sock_sendmsg_all(cls, connection: socket.socket, buffers: list[Buffer]):
+        """Like ``sendmsg_all`` on a non-blocking socket, waiting on the event
+        loop whenever the send buffer is full."""
+        loop = asyncio.get_running_loop()
+        views = [memoryview(buffer) for buffer in buffers if len(buffer)]
+        while views:
+            try:
+                sent = connection.sendmsg(views[:cls.MAX_SEND_BUFFERS])
+            except (BlockingIOError, InterruptedError):
+                writable = loop.create_future()
+
+                def wake(writable=writable):
+                    if not writable.done():
+                        writable.set_result(None)
+
+                loop.add_writer(connection, wake)
+                try:
+                    await writable
+                finally:
+                    loop.remove_writer(connection)
+                continue
+            cls.skip_sent(views, sent)
+
+    @classmethod
+    async def send_responses(cls, connection: socket.socket, responses: list[Response]):
+        loop = asyncio.get_running_loop()
+        pending = []
+        try:
+            for response in responses:
+                pending.extend(response.buffers)
+                if response.file:
+                    await cls.sock_sendmsg_all(connection, pending)
+                    pending = []
+                    response.check_file_sent(
+                        await loop.sock_sendfile(
+                            connection, response.file, count=response.file_size
+                        )
+                    )
+            if pending:
+                await cls.sock_sendmsg_all(connection, pending)
+        finally:
+            for response in responses:
+                response.close()
+
+
+class PreforkSupervisor:
+    """Run ``run_worker`` in ``workers`` forked processes and restart any that exit.
+
+    SIGTERM or SIGINT stops the workers and returns from ``run``.
+    """
+    RESTART_DELAY = 1.0
+
+    def __init__(self, run_worker: Callable[[], None], workers: int):
+        self.run_worker = run_worker
+        self.workers = workers
+        self.pids = {}
+        self.running = False
+
+    def start_worker(self):
+        pid = os.fork()
+        if pid:
+            self.pids[pid] = time.monotonic()
+            logger.info(f'Started worker {pid}')
+            return
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            self.run_worker()
+        except BaseException:
+            logger.exception('Worker crashed')
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def stop(self, signum, frame):
+        self.running = False
+        for pid in list(self.pids):
+            # The worker may have exited since it was last reaped.
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    def run(self):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.start_worker()
+
+        while self.pids:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.pids.pop(pid, None)
+            if started is None or not self.running:
+                continue
+            logger.warning(
+                f'Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}, '
+                f'restarting'
+            )
+            if time.monotonic() - started < self.RESTART_DELAY:
+                time.sleep(self.RESTART_DELAY)
+            if self.running:
+                self.start_worker()
+        logger.info('All workers stopped')
 
 
 class TCPClient(BaseClient):
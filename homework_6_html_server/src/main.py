@@ -1,83 +1,233 @@
+import asyncio
 import os
+from functools import partial
+from typing import Optional
 
 from logger import logger
-from httpd import TCPServer
-from utils import parse_data, initiate_argument_parser, read_template, define_template_path
+from cache import CachedResponse, StaticFileCache
+from httpd import AsyncTCPServer, PreforkSupervisor, Response, TCPServer
+from utils import (
+   parse_data,
+   initiate_argument_parser,
+   open_static_file,
+   define_template_path,
+   normalize_request_path,
+   resolve_static_path,
+)
+
+
+def build_page_response(
+   doc_root: str,
+   page: str,
+   status_code: int,
+   status_message: str,
+   keep_alive: bool = True,
+   head: bool = False,
+   file_cache: Optional[StaticFileCache] = None,
+   request_headers: Optional[dict[str, str]] = None,
+):
+   """Build the response for a page; passing ``request_headers`` adds ETag and
+   Last-Modified and lets a matching conditional request get 304."""
+   # A cache hit is found by the request path alone; the path is only
+   # resolved and checked against the document root on a miss. Entries are
+   # revalidated through the unresolved path, so a retargeted symlink is seen.
+   request_path = normalize_request_path(page)
+   if file_cache:
+       cached = file_cache.get(request_path, status_code)
+       if cached:
+           return cached.response(keep_alive, head, request_headers)
+
+   template_path = define_template_path(doc_root, page)
+   file_path = resolve_static_path(doc_root, template_path)
+   file, file_stat = open_static_file(file_path)
+   content_type = TCPServer.get_content_type(file_path)
+   validators = request_headers is not None
+   if file_cache and file_cache.fits(file_stat.st_size):
+       with file:
+           body = file.read()
+       cached = CachedResponse.build(
+           body,
+           template_path,
+           file_stat,
+           status_code,
+           content_type,
+           status_message,
+           validators,
+       )
+       file_cache.put(request_path, status_code, cached)
+       return cached.response(keep_alive, head, request_headers)
+
+   etag = last_modified = None
+   if validators:
+       etag = TCPServer.build_etag(file_stat)
+       last_modified = TCPServer.format_http_date(file_stat.st_mtime)
+       if TCPServer.is_not_modified(request_headers, etag, file_stat.st_mtime):
+           file.close()
+           return Response(TCPServer.build_not_modified(etag, last_modified, keep_alive))
+
+   return TCPServer.build_file_response(
+       file,
+       status_code,
+       file_stat.st_size,
+       content_type,
+       status_message,
+       keep_alive,
+       head,
+       etag,
+       last_modified,
+   )
+
+
+def handle_request(
+   data: str,
+   doc_root: str,
+   keep_alive: bool = True,
+   file_cache: Optional[StaticFileCache] = None,
+) -> Response:
+   method, path = parse_data(data)
+   head = method == 'HEAD'
+
+   if method not in ('GET', 'HEAD'):
+       logger.error(f'{method} is not allowed')
+       return build_page_response(
+           doc_root, '405', 405, 'Not Allowed', keep_alive, file_cache=file_cache
+       )
 
+   try:
+       return build_page_response(
+           doc_root,
+           path,
+           200,
+           'OK',
+           keep_alive,
+           head,
+           file_cache,
+           TCPServer.parse_headers(data),
+       )
+   except FileNotFoundError as err:
+       logger.error(err)
+       return build_page_response(
+           doc_root, '404', 404, 'Not Found', keep_alive, head, file_cache
+       )
 
-def main():
-   parser = initiate_argument_parser()
-   args = parser.parse_args()
-   doc_root = args.doc_root
-   if not doc_root or not os.path.exists(doc_root):
-       raise ValueError('Root folder must be set')
-   logger.info(f'Document root is set to: {doc_root}')
 
-   tcp_server = TCPServer('127.0.0.1', 8000, 5)
-
-   while True:
-       data = tcp_server.serve()
-       if data is None:
-           break
-       try:
-           method, path = parse_data(data)
-
-           if method not in ('GET', 'HEAD'):
-               logger.error(f'{method} is not allowed')
-
-               template_path = define_template_path(
-                   doc_root,
-                   requested_path='405'
-               )
-               template = read_template(template_path)
-               response = tcp_server.build_response(
-                   template,
-                   status_code=405,
-                   content_length=len(template),
-                   content_type='text/html',
-                   status_message='Not Allowed'
-               )
-               tcp_server.send(response)
+def serve_blocking(
+   tcp_server: TCPServer,
+   doc_root: str,
+   file_cache: Optional[StaticFileCache] = None,
+):
+   try:
+       while True:
+           data = tcp_server.serve()
+           # Waiting on an idle client would block every other client, so only
+           # a connection with more pipelined request bytes already read stays
+           # open.
+           keep_alive = (
+               tcp_server.keep_alive(data) and tcp_server.has_buffered_request()
+           )
+           try:
+               response = handle_request(data, doc_root, keep_alive, file_cache)
+               tcp_server.send_response(response)
+
+           except (ValueError, OSError) as err:
+               logger.error(err)
                tcp_server.close_connection()
                continue
 
-           template_path = define_template_path(doc_root, path)
-           template = read_template(template_path)
-
-           content_type = tcp_server.get_content_type(template_path)
-           status_code = 200
-           status_message = 'OK'
-
-       except ValueError as err:
-           logger.error(err)
-           break
-
-       except FileNotFoundError as err:
-           logger.error(err)
-
-           template_path = define_template_path(
-               root_path=doc_root,
-               requested_path='404'
-           )
-           template = read_template(template_path)
-
-           content_type = 'text/html'
-           status_code = 404
-           status_message = 'Not Found'
+           if not keep_alive:
+               tcp_server.close_connection()
 
-       response = tcp_server.build_response(
-           template,
-           status_code,
-           len(template),
-           content_type,
-           status_message,
+   except KeyboardInterrupt:
+       pass
+   finally:
+       tcp_server.close()
+       logger.info("Server closed")
+
+
+def serve_async(
+   tcp_server: AsyncTCPServer,
+   doc_root: str,
+   file_cache: Optional[StaticFileCache] = None,
+):
+   logger.info(f'Serving up to {tcp_server.max_connections} concurrent connections')
+   try:
+       asyncio.run(tcp_server.serve_forever(
+           partial(handle_request, doc_root=doc_root, file_cache=file_cache)
+       ))
+   except KeyboardInterrupt:
+       pass
+   finally:
+       tcp_server.close()
+       logger.info("Server closed")
+
+
+def create_server(args):
+   if args.mode == 'async':
+       return AsyncTCPServer(
+           '127.0.0.1',
+           8000,
+           1024,
+           max_connections=args.max_connections,
+           reuse_port=args.reuse_port,
+           idle_timeout=args.keep_alive_timeout,
+           max_requests=args.max_requests,
        )
+   return TCPServer(
+       '127.0.0.1',
+       8000,
+       5,
+       reuse_port=args.reuse_port,
+       idle_timeout=args.keep_alive_timeout,
+       max_requests=args.max_requests,
+   )
+
+
+def create_file_cache(args):
+   if args.cache_size <= 0:
+       return None
+   return StaticFileCache(
+       args.cache_size,
+       args.cache_max_file_size,
+       args.cache_revalidate_interval,
+   )
+
+
+def serve(tcp_server: TCPServer, doc_root: str, args):
+   file_cache = create_file_cache(args)
+   if args.mode == 'async':
+       serve_async(tcp_server, doc_root, file_cache)
+   else:
+       serve_blocking(tcp_server, doc_root, file_cache)
+
+
+def serve_prefork(doc_root: str, args):
+   # With SO_REUSEPORT every worker binds its own socket and the kernel
+   # balances connections between them; otherwise all workers accept on the
+   # socket bound here before forking.
+   tcp_server = None if args.reuse_port else create_server(args)
+
+   def run_worker():
+       serve(tcp_server or create_server(args), doc_root, args)
+
+   logger.info(f'Starting {args.workers} workers')
+   PreforkSupervisor(run_worker, args.workers).run()
+   if tcp_server:
+       tcp_server.close()
+   logger.info("Server closed")
 
-       tcp_server.send(response)
-       tcp_server.close_connection()
 
-   tcp_server.close()
-   logger.info("Server closed")
+def main():
+   parser = initiate_argument_parser()
+   args = parser.parse_args()
+   doc_root = args.doc_root
+   if not doc_root or not os.path.exists(doc_root):
+       raise ValueError('Root folder must be set')
+   logger.info(f'Document root is set to: {doc_root}')
+
+   if args.workers > 1:
+       serve_prefork(doc_root, args)
+   else:
+       serve(create_server(args), doc_root, args)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,5 +1,6 @@
 import argparse
 import os
+from urllib.parse import unquote, urlsplit
 
 from logger import logger
 
@@ -19,26 +20,56 @@ def initiate_argument_parser():
         description='OTUS Homework about HTTP server',
     )
     parser.add_argument('-r', '--doc-root')
+    parser.add_argument('-m', '--mode', choices=('blocking', 'async'), default='blocking')
+    parser.add_argument('-c', '--max-connections', type=int, default=1000)
+    parser.add_argument('-w', '--workers', type=int, default=1)
+    parser.add_argument('--reuse-port', action='store_true')
+    parser.add_argument(
+        '--keep-alive-timeout',
+        type=float,
+        default=5.0,
+        help='idle timeout of persistent connections, which need --mode async',
+    )
+    parser.add_argument('--max-requests', type=int, default=100)
+    parser.add_argument('--cache-size', type=int, default=64 * 1024 * 1024)
+    parser.add_argument('--cache-max-file-size', type=int, default=1024 * 1024)
+    parser.add_argument('--cache-revalidate-interval', type=float, default=1.0)
     return parser
 
+def normalize_request_path(requested_path: str):
+    return unquote(urlsplit(requested_path).path).lstrip('/')
+
+
 def define_template_path(
     root_path:str,
     requested_path: str,
 ):
-    template_path = os.path.join(root_path, requested_path, 'index.html')
+    relative_path = normalize_request_path(requested_path)
+    template_path = os.path.join(root_path, relative_path)
 
-    if requested_path == '/':
-        template_path = os.path.join(root_path, 'index.html')
+    if os.path.isdir(template_path):
+        template_path = os.path.join(template_path, 'index.html')
 
     return template_path
 
 
-def read_template(
-    template_path: str,
+def resolve_static_path(
+    root_path: str,
+    file_path: str,
 ):
-    if os.path.exists(template_path):
-        with open(template_path) as file:
-            template = file.read()
-        return template
-    raise FileNotFoundError(f'File {template_path} could not be found')
+    """Resolve ``file_path`` to a real path, treating paths outside ``root_path`` as missing."""
+    real_root = os.path.realpath(root_path)
+    real_path = os.path.realpath(file_path)
+    if os.path.commonpath((real_root, real_path)) != real_root:
+        raise FileNotFoundError(f'File {file_path} is outside of the document root')
+    return real_path
 
+
+def open_static_file(
+    file_path: str,
+):
+    try:
+        file = open(file_path, 'rb')
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        raise FileNotFoundError(f'File {file_path} could not be found')
+    return file, os.fstat(file.fileno())
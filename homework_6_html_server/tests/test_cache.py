@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from cache import CachedResponse, StaticFileCache
+
+
+def build_entry(file_path):
+    with open(file_path, 'rb') as file:
+        body = file.read()
+        file_stat = os.fstat(file.fileno())
+    return CachedResponse.build(body, file_path, file_stat, 200, 'text/html', 'OK')
+
+
+@pytest.fixture
+def pages(tmp_path):
+    paths = []
+    for name in ('a.html', 'b.html', 'c.html'):
+        path = tmp_path / name
+        path.write_bytes(b'x' * 100)
+        paths.append(str(path))
+    return paths
+
+
+def test_cached_response_keeps_body_once(pages):
+    entry = build_entry(pages[0])
+
+    response = entry.response(keep_alive=False)
+    head_response = entry.response(head=True)
+
+    assert response.buffers == [entry.headers[False], entry.body]
+    assert b'Connection: close' in entry.headers[False]
+    assert head_response.buffers == [entry.headers[True]]
+    assert entry.memory_size == len(entry.body) + sum(
+        len(payload)
+        for payloads in (entry.headers, entry.not_modified_payloads)
+        for payload in payloads.values()
+    )
+
+
+def test_cached_response_answers_not_modified(pages):
+    entry = build_entry(pages[0])
+
+    response = entry.response(request_headers={'if-none-match': entry.etag})
+
+    assert response.buffers == [entry.not_modified_payloads[True]]
+
+
+def test_static_file_cache_evicts_least_recently_used(pages):
+    entries = [build_entry(path) for path in pages]
+    cache = StaticFileCache(
+        max_size=entries[0].memory_size * 2, max_file_size=1024, revalidate_interval=60
+    )
+
+    cache.put('a.html', 200, entries[0])
+    cache.put('b.html', 200, entries[1])
+    assert cache.get('a.html', 200) is entries[0]
+    cache.put('c.html', 200, entries[2])
+
+    assert cache.get('a.html', 200) is entries[0]
+    assert cache.get('b.html', 200) is None
+    assert cache.get('c.html', 200) is entries[2]
+    assert cache.size == entries[0].memory_size + entries[2].memory_size
+
+
+def test_static_file_cache_keys_by_status_code(pages):
+    entry = build_entry(pages[0])
+    cache = StaticFileCache(max_size=1024 * 1024, max_file_size=1024)
+
+    cache.put('a.html', 404, entry)
+
+    assert cache.get('a.html', 200) is None
+    assert cache.get('a.html', 404) is entry
+
+
+def test_static_file_cache_skips_entries_above_max_size(pages):
+    entry = build_entry(pages[0])
+    cache = StaticFileCache(max_size=entry.memory_size - 1, max_file_size=1024)
+
+    cache.put('a.html', 200, entry)
+
+    assert cache.get('a.html', 200) is None
+    assert cache.size == 0
+    assert not cache.fits(entry.memory_size)
+
+
+def test_static_file_cache_revalidates_after_interval(pages):
+    entry = build_entry(pages[0])
+    cache = StaticFileCache(max_size=1024 * 1024, max_file_size=1024)
+    cache.put('a.html', 200, entry)
+
+    with open(pages[0], 'ab') as file:
+        file.write(b'changed')
+
+    assert cache.get('a.html', 200) is entry
+
+    cache.revalidate_interval = 0
+    assert cache.get('a.html', 200) is None
+    assert cache.size == 0
+
+
+def test_static_file_cache_drops_removed_files(pages):
+    entry = build_entry(pages[0])
+    cache = StaticFileCache(max_size=1024 * 1024, max_file_size=1024)
+    cache.put('a.html', 200, entry)
+    cache.revalidate_interval = 0
+
+    os.remove(pages[0])
+
+    assert cache.get('a.html', 200) is None
@@ -0,0 +1,183 @@
+import asyncio
+import email.utils
+import socket
+
+import pytest
+
+from httpd import AsyncTCPServer, RequestTooLarge, Response, TCPServer
+
+
+ETAG = '"1-2-3"'
+MTIME = 1_700_000_000.5
+
+
+def test_split_request_waits_for_complete_headers():
+    buffer = bytearray(b'GET / HTTP/1.1\r\nHost: x\r\n')
+
+    assert TCPServer.split_request(buffer) is None
+    assert buffer == b'GET / HTTP/1.1\r\nHost: x\r\n'
+
+
+def test_split_request_cuts_pipelined_requests_in_order():
+    buffer = bytearray(
+        b'GET /a HTTP/1.1\r\n\r\nGET /b HTTP/1.1\r\nConnection: close\r\n\r\nGET /c'
+    )
+
+    assert TCPServer.split_request(buffer) == 'GET /a HTTP/1.1\r\n\r\n'
+    assert TCPServer.split_request(buffer) == (
+        'GET /b HTTP/1.1\r\nConnection: close\r\n\r\n'
+    )
+    assert TCPServer.split_request(buffer) is None
+    assert buffer == b'GET /c'
+
+
+def test_split_request_drops_body_once_it_has_arrived():
+    buffer = bytearray(b'POST / HTTP/1.1\r\nContent-Length: 4\r\n\r\nab')
+
+    assert TCPServer.split_request(buffer) is None
+
+    buffer += b'cdGET / HTTP/1.1\r\n\r\n'
+    assert TCPServer.split_request(buffer) == (
+        'POST / HTTP/1.1\r\nContent-Length: 4\r\n\r\n'
+    )
+    assert buffer == b'GET / HTTP/1.1\r\n\r\n'
+
+
+def test_split_request_rejects_invalid_content_length():
+    buffer = bytearray(b'POST / HTTP/1.1\r\nContent-Length: -1\r\n\r\n')
+
+    with pytest.raises(ValueError):
+        TCPServer.split_request(buffer)
+
+
+def test_split_request_rejects_body_above_limit():
+    content_length = TCPServer.MAX_BODY_SIZE + 1
+    buffer = bytearray(
+        f'POST / HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n'.encode()
+    )
+
+    with pytest.raises(RequestTooLarge):
+        TCPServer.split_request(buffer)
+
+
+def test_split_request_rejects_oversized_headers():
+    buffer = bytearray(b'GET / HTTP/1.1\r\n' + b'X' * TCPServer.MAX_HEADERS_SIZE)
+
+    with pytest.raises(ValueError):
+        TCPServer.split_request(buffer)
+
+
+@pytest.mark.parametrize(
+    'request_line, connection, expected',
+    [
+        ('GET / HTTP/1.1', None, True),
+        ('GET / HTTP/1.1', 'close', False),
+        ('GET / HTTP/1.1', 'Close', False),
+        ('GET / HTTP/1.0', None, False),
+        ('GET / HTTP/1.0', 'keep-alive', True),
+        ('GET / HTTP/1.0', 'Keep-Alive', True),
+    ],
+)
+def test_client_keeps_alive(request_line, connection, expected):
+    headers = [request_line, 'Host: x']
+    if connection is not None:
+        headers.append(f'Connection: {connection}')
+    request = '\r\n'.join(headers) + '\r\n\r\n'
+
+    assert TCPServer.client_keeps_alive(request) is expected
+
+
+@pytest.mark.parametrize(
+    'if_none_match, expected',
+    [
+        (ETAG, True),
+        (f'W/{ETAG}', True),
+        (f'"other", {ETAG}', True),
+        ('*', True),
+        ('"other"', False),
+    ],
+)
+def test_is_not_modified_compares_etags_weakly(if_none_match, expected):
+    request_headers = {'if-none-match': if_none_match}
+
+    assert TCPServer.is_not_modified(request_headers, ETAG, MTIME) is expected
+
+
+@pytest.mark.parametrize(
+    'if_modified_since, expected',
+    [
+        (email.utils.formatdate(MTIME, usegmt=True), True),
+        (email.utils.formatdate(MTIME + 60, usegmt=True), True),
+        (email.utils.formatdate(MTIME - 60, usegmt=True), False),
+        ('not a date', False),
+        ('', False),
+    ],
+)
+def test_is_not_modified_by_date(if_modified_since, expected):
+    request_headers = {'if-modified-since': if_modified_since}
+
+    assert TCPServer.is_not_modified(request_headers, ETAG, MTIME) is expected
+
+
+def test_is_not_modified_prefers_if_none_match():
+    request_headers = {
+        'if-none-match': '"other"',
+        'if-modified-since': email.utils.formatdate(MTIME + 60, usegmt=True),
+    }
+
+    assert TCPServer.is_not_modified(request_headers, ETAG, MTIME) is False
+
+
+def test_is_not_modified_without_validators():
+    assert TCPServer.is_not_modified({}, ETAG, MTIME) is False
+
+
+def build_grown_file_response(tmp_path, content_length):
+    path = tmp_path / 'grown.bin'
+    path.write_bytes(b'a' * 1000 + b'b' * 500)
+    return TCPServer.build_file_response(
+        open(path, 'rb'), 200, content_length, 'application/octet-stream', 'OK'
+    )
+
+
+def read_until_closed(connection):
+    data = b''
+    while chunk := connection.recv(65536):
+        data += chunk
+    return data
+
+
+def test_send_response_stops_at_content_length(tmp_path):
+    response = build_grown_file_response(tmp_path, 1000)
+    server = TCPServer('127.0.0.1', 0, 1)
+    server.connection, client = socket.socketpair()
+    try:
+        server.send_response(response)
+        server.close_connection()
+
+        assert read_until_closed(client) == response.payload + b'a' * 1000
+    finally:
+        server.close()
+        client.close()
+
+
+def test_send_responses_stops_at_content_length(tmp_path):
+    responses = [
+        build_grown_file_response(tmp_path, 1000),
+        Response(b'next'),
+    ]
+    connection, client = socket.socketpair()
+    connection.setblocking(False)
+    with connection, client:
+        asyncio.run(AsyncTCPServer.send_responses(connection, responses))
+        connection.close()
+
+        assert read_until_closed(client) == responses[0].payload + b'a' * 1000 + b'next'
+
+
+def test_send_responses_rejects_shrunk_file(tmp_path):
+    response = build_grown_file_response(tmp_path, 2000)
+    connection, client = socket.socketpair()
+    connection.setblocking(False)
+    with connection, client, pytest.raises(ValueError):
+        asyncio.run(AsyncTCPServer.send_responses(connection, [response]))
@@ -0,0 +1,77 @@
+import os
+import signal
+import time
+
+from httpd import PreforkSupervisor
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise AssertionError('condition not met in time')
+
+
+def read_pids(pids_path):
+    if not pids_path.exists():
+        return []
+    return [int(line) for line in pids_path.read_text().split()]
+
+
+def wait_for_pids(pids_path, count):
+    return wait_for(lambda: len(read_pids(pids_path)) == count and read_pids(pids_path))
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def start_supervisor(pids_path, workers):
+    """Fork a process running PreforkSupervisor, whose workers record their
+    pids in ``pids_path`` and then sleep until killed."""
+    def run_worker():
+        with open(pids_path, 'a') as pids_file:
+            pids_file.write(f'{os.getpid()}\n')
+        while True:
+            time.sleep(1)
+
+    pid = os.fork()
+    if pid:
+        return pid
+    exit_code = 0
+    try:
+        supervisor = PreforkSupervisor(run_worker, workers)
+        supervisor.RESTART_DELAY = 0
+        supervisor.run()
+    except BaseException:
+        exit_code = 1
+    finally:
+        os._exit(exit_code)
+
+
+def test_prefork_supervisor_restarts_killed_worker_and_stops(tmp_path):
+    pids_path = tmp_path / 'pids'
+    supervisor_pid = start_supervisor(pids_path, 2)
+    try:
+        first, second = wait_for_pids(pids_path, 2)
+
+        os.kill(first, signal.SIGKILL)
+        restarted = wait_for_pids(pids_path, 3)[2]
+        assert restarted not in (first, second)
+        assert is_running(second) and is_running(restarted)
+
+        os.kill(supervisor_pid, signal.SIGTERM)
+        _, status = os.waitpid(supervisor_pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert not is_running(second) and not is_running(restarted)
+    finally:
+        if is_running(supervisor_pid):
+            os.kill(supervisor_pid, signal.SIGKILL)
+            os.waitpid(supervisor_pid, 0)
@@ -0,0 +1,158 @@
+import asyncio
+import contextlib
+import socket
+import threading
+from functools import partial
+
+import pytest
+
+from cache import StaticFileCache
+from httpd import AsyncTCPServer
+from main import handle_request
+
+
+INDEX_BODY = b'<html><body>index</body></html>\n'
+BIG_BODY = bytes(range(256)) * 1024
+
+
+@pytest.fixture
+def doc_root(tmp_path):
+    (tmp_path / 'index.html').write_bytes(INDEX_BODY)
+    (tmp_path / 'big.bin').write_bytes(BIG_BODY)
+    (tmp_path / '404').write_bytes(b'not found\n')
+    (tmp_path / '405').write_bytes(b'not allowed\n')
+    return tmp_path
+
+
+@pytest.fixture(params=[False, True], ids=['uncached', 'cached'])
+def server_address(request, doc_root):
+    """Run an AsyncTCPServer on an ephemeral port in a background thread.
+
+    With the cache on, small pages are served from memory while big.bin,
+    above the cache's file size limit, still goes through sendfile.
+    """
+    server = AsyncTCPServer('127.0.0.1', 0, 16, idle_timeout=2.0, max_requests=10)
+    file_cache = StaticFileCache(1 << 20, 1 << 16) if request.param else None
+    handler = partial(handle_request, doc_root=str(doc_root), file_cache=file_cache)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.serve_forever(handler))
+
+    def run():
+        with contextlib.suppress(asyncio.CancelledError):
+            loop.run_until_complete(task)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    yield server.server_socket.getsockname()
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(timeout=5)
+    server.close()
+    loop.close()
+
+
+def read_response(reader, head=False):
+    status = reader.readline().decode().rstrip('\r\n')
+    headers = {}
+    while True:
+        line = reader.readline().decode().rstrip('\r\n')
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body = b''
+    if not head and 'content-length' in headers:
+        body = reader.read(int(headers['content-length']))
+    return status, headers, body
+
+
+@contextlib.contextmanager
+def connect(address):
+    with socket.create_connection(address, timeout=5) as client:
+        with client.makefile('rb') as reader:
+            yield client, reader
+
+
+def test_get_serves_cached_and_sendfile_bodies(server_address):
+    with connect(server_address) as (client, reader):
+        client.sendall(b'GET / HTTP/1.1\r\nHost: x\r\n\r\n')
+        status, headers, body = read_response(reader)
+        assert status == 'HTTP/1.1 200 OK'
+        assert headers['content-type'] == 'text/html'
+        assert body == INDEX_BODY
+
+        client.sendall(b'GET /big.bin HTTP/1.1\r\nHost: x\r\n\r\n')
+        status, headers, body = read_response(reader)
+        assert status == 'HTTP/1.1 200 OK'
+        assert int(headers['content-length']) == len(BIG_BODY)
+        assert body == BIG_BODY
+
+
+def test_head_sends_headers_only(server_address):
+    with connect(server_address) as (client, reader):
+        client.sendall(
+            b'HEAD /big.bin HTTP/1.1\r\nHost: x\r\n\r\n'
+            b'GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n'
+        )
+        status, headers, _ = read_response(reader, head=True)
+        assert status == 'HTTP/1.1 200 OK'
+        assert int(headers['content-length']) == len(BIG_BODY)
+
+        status, _, body = read_response(reader)
+        assert status == 'HTTP/1.1 200 OK'
+        assert body == INDEX_BODY
+
+
+def test_pipelined_requests_are_answered_in_order(server_address):
+    with connect(server_address) as (client, reader):
+        client.sendall(
+            b'GET /big.bin HTTP/1.1\r\nHost: x\r\n\r\n'
+            b'GET /missing HTTP/1.1\r\nHost: x\r\n\r\n'
+            b'GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n'
+        )
+        responses = [read_response(reader) for _ in range(3)]
+
+        assert [status for status, _, _ in responses] == [
+            'HTTP/1.1 200 OK',
+            'HTTP/1.1 404 Not Found',
+            'HTTP/1.1 200 OK',
+        ]
+        assert [headers['connection'] for _, headers, _ in responses] == [
+            'keep-alive',
+            'keep-alive',
+            'close',
+        ]
+        assert responses[0][2] == BIG_BODY
+        assert responses[2][2] == INDEX_BODY
+        assert reader.read() == b''
+
+
+def test_matching_etag_gets_not_modified(server_address):
+    with connect(server_address) as (client, reader):
+        client.sendall(b'GET / HTTP/1.1\r\nHost: x\r\n\r\n')
+        _, headers, _ = read_response(reader)
+        etag = headers['etag']
+
+        client.sendall(
+            f'GET / HTTP/1.1\r\nHost: x\r\nIf-None-Match: {etag}\r\n\r\n'.encode()
+        )
+        status, headers, _ = read_response(reader, head=True)
+        assert status == 'HTTP/1.1 304 Not Modified'
+        assert headers['etag'] == etag
+        assert 'content-length' not in headers
+
+        client.sendall(b'GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+        status, _, body = read_response(reader)
+        assert status == 'HTTP/1.1 200 OK'
+        assert body == INDEX_BODY
+
+
+def test_oversized_body_gets_payload_too_large(server_address):
+    with connect(server_address) as (client, reader):
+        client.sendall(
+            b'POST / HTTP/1.1\r\nHost: x\r\nContent-Length: 99999999999\r\n\r\n'
+        )
+        status, headers, _ = read_response(reader)
+
+        assert status == 'HTTP/1.1 413 Payload Too Large'
+        assert headers['connection'] == 'close'
+        assert reader.read() == b''